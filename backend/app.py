@@ -1,13 +1,29 @@
 # backend/app.py
+import threading
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from datetime import datetime
+from config import ROLE, CATALOG_MAX_AGE
 
 app = Flask(__name__)
-CORS(app)
+# expose the paging/caching headers to the frontend (another origin)
+CORS(app, expose_headers=["X-Next-Cursor", "ETag"])
 
-# MongoDB connection
+# MongoDB connection (opened on first use, see mongo_client)
 from services.mongo_client import db
+from services.indexes import ensure_indexes
+from services.catalog_service import get_catalog
+from services.http_cache import json_response, make_etag
+
+def _ensure_indexes():
+    try:
+        ensure_indexes()
+    except Exception as e:
+        print(f"⚠ Could not ensure MongoDB indexes: {e}")
+
+# off the startup path: the app can take requests while Mongo builds/validates indexes
+if ROLE == "all":
+    threading.Thread(target=_ensure_indexes, daemon=True).start()
 
 # JWT
 from flask_jwt_extended import JWTManager
@@ -17,32 +33,45 @@ jwt = JWTManager(app)
 # ---------------- Blueprints ----------------
 from routes.auth_route import auth_bp
 from routes.crops_route import bp as crops_bp
-from routes.predict_route import bp as predict_bp
-from routes.ingest_route import bp as ingest_bp
-from routes.train_route import bp as train_bp
 from routes.market_route import bp as market_bp # ✅ NEW
 from routes.chatbot_route import chatbot_bp
 
 # Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(crops_bp)
-app.register_blueprint(predict_bp)
-app.register_blueprint(ingest_bp)
-app.register_blueprint(train_bp)
 app.register_blueprint(market_bp)   # ✅ NEW
-app.register_blueprint(chatbot_bp)   # ✅ NEW
+# KM_ROLE=market: market routes only (SSE/long-poll, served by an async worker, see gunicorn.conf.py)
+if ROLE != "market":
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(crops_bp)
+    app.register_blueprint(chatbot_bp)   # ✅ NEW
+
+# KM_ROLE=meta: catalog/auth/market/chatbot only
+if ROLE not in ("meta", "market"):
+    from routes.predict_route import bp as predict_bp
+    from routes.ingest_route import bp as ingest_bp
+    from routes.train_route import bp as train_bp
+    app.register_blueprint(predict_bp)
+    app.register_blueprint(ingest_bp)
+    app.register_blueprint(train_bp)
 
 # ---------------- Core Endpoints ----------------
 @app.route('/')
 def index():
     return jsonify({"status": "KrishiMitra backend running"})
 
+# Catalog endpoints: served from the in-memory catalog (services/catalog_service),
+# which tracks the version ingest publishes instead of querying crops per request.
+
+def _catalog_response(catalog, payload):
+    # ETag follows the catalog version, so it changes exactly when ingest publishes new data
+    return json_response(payload, etag=make_etag("catalog", catalog.version),
+                         max_age=CATALOG_MAX_AGE, last_modified=catalog.updated_at)
+
 # List all states present in DB
 @app.route("/api/states", methods=["GET"])
 def list_states():
     try:
-        states = sorted([s for s in db.crops.distinct("state") if s and isinstance(s, str)])
-        return jsonify({"states": states})
+        catalog = get_catalog()
+        return _catalog_response(catalog, {"states": catalog.states})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -53,10 +82,8 @@ def list_districts():
     if not state:
         return jsonify({"error": "Missing 'state' query param"}), 400
     try:
-        districts = sorted(
-            [d for d in db.crops.distinct("district", {"state": state}) if d and isinstance(d, str)]
-        )
-        return jsonify({"state": state, "districts": districts})
+        catalog = get_catalog()
+        return _catalog_response(catalog, {"state": state, "districts": catalog.districts(state)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -70,16 +97,9 @@ def list_crops():
         return jsonify({"error": "Missing 'state' or 'district'"}), 400
 
     try:
-        crops = sorted(
-            [
-                c
-                for c in db.crops.distinct(
-                    "commodity", {"state": state, "district": district}
-                )
-                if c and isinstance(c, str)
-            ]
-        )
-        return jsonify({"state": state, "district": district, "crops": crops})
+        catalog = get_catalog()
+        return _catalog_response(catalog, {"state": state, "district": district,
+                                           "crops": catalog.crops(state, district)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -92,6 +112,19 @@ def health():
     except Exception as e:
         return jsonify({"status": "degraded", "error": str(e)}), 500
 
+# Readiness: 503 while a model preload/warm-up pass is running (see wsgi.py)
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    from services.warmup_service import readiness
+    state = readiness()
+    return jsonify({"status": "warming" if state["warming"] else "ready", **state}), (503 if state["warming"] else 200)
+
 
 if __name__ == "__main__":
+    # development server; production runs wsgi.py under gunicorn (gunicorn.conf.py)
+    from services.warmup_service import start as start_warmup
+    start_warmup()
+    if ROLE == "all":
+        from services.train_scheduler import start_scheduler
+        start_scheduler()  # picks up jobs queued before a restart
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,82 @@
+# backend/bench_auth.py
+"""
+Login and /me throughput against a running backend, plus the latency other
+traffic sees while a login burst is in progress.
+
+    python bench_auth.py [--base http://127.0.0.1:5000] [--threads 16] [--seconds 10]
+
+Registers (or reuses) a throwaway farmer account bench-auth@example.com.
+Reports requests/s and p50/p95 latency for:
+  login       POST /api/auth/login from --threads clients
+  me          GET /api/auth/me with the token from --threads clients
+  health      GET /api/health from one client while the login burst runs
+"""
+import time, argparse, statistics, threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+EMAIL, PASSWORD = "bench-auth@example.com", "bench-auth-password"
+
+
+def _hammer(fn, threads, seconds):
+    latencies, statuses, lock = [], {}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        s = requests.Session()
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            code = fn(s)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                statuses[code] = statuses.get(code, 0) + 1
+
+    with ThreadPoolExecutor(threads) as ex:
+        for _ in range(threads):
+            ex.submit(worker)
+    return latencies, statuses
+
+
+def _report(name, latencies, statuses, seconds):
+    if not latencies:
+        print(f"{name:8s} no requests completed")
+        return
+    q = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+    print(f"{name:8s} {len(latencies) / seconds:8.1f} req/s   p50 {1000 * statistics.median(latencies):7.1f} ms"
+          f"   p95 {1000 * q[18]:7.1f} ms   status {dict(sorted(statuses.items()))}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://127.0.0.1:5000")
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=10)
+    args = ap.parse_args()
+    auth = f"{args.base}/api/auth"
+
+    requests.post(f"{auth}/register", json={"name": "Bench", "email": EMAIL, "password": PASSWORD,
+                                            "role": "farmer", "contact": "0", "districtPreferences": []})
+    resp = requests.post(f"{auth}/login", json={"email": EMAIL, "password": PASSWORD})
+    resp.raise_for_status()
+    headers = {"Authorization": f"Bearer {resp.json()['token']}"}
+
+    login = lambda s: s.post(f"{auth}/login", json={"email": EMAIL, "password": PASSWORD}).status_code
+    me = lambda s: s.get(f"{auth}/me", headers=headers).status_code
+    health = lambda s: s.get(f"{args.base}/api/health").status_code
+
+    # login burst with one "other traffic" client alongside
+    result = {}
+    side = threading.Thread(target=lambda: result.update(health=_hammer(health, 1, args.seconds)))
+    side.start()
+    lat, st = _hammer(login, args.threads, args.seconds)
+    side.join()
+    _report("login", lat, st, args.seconds)
+    _report("health", *result["health"], args.seconds)
+
+    lat, st = _hammer(me, args.threads, args.seconds)
+    _report("me", lat, st, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
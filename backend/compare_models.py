@@ -0,0 +1,105 @@
+# backend/compare_models.py
+"""
+Per-pair LSTMs vs the global multi-series model on the current data:
+total training time, model memory and prediction latency.
+
+    python compare_models.py [--sample 3] [--repeat 20] [--out-dir DIR]
+
+Per-pair training time is measured on --sample pairs and extrapolated to all
+pairs (training all of them here would take hours); everything else is measured.
+The global model is trained into --out-dir (a temporary directory, removed
+afterwards, by default); the served models in MODELS_DIR are only read.
+"""
+import os, glob, json, time, random, argparse, shutil, tempfile
+import numpy as np
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.models import load_model
+from config import MODELS_DIR, SEQ_LEN, PRED_HORIZON, EPOCHS, BATCH_SIZE
+from services.train_service import build_model, WindowSequence
+from services.preprocess_service import scale_series
+from services.global_model_service import train_global_model, load_training_series, predict_fn_from, model_paths
+from services.model_registry import get_predictor
+from services.rollout_service import rollout
+
+
+def _mb(nbytes):
+    return f"{nbytes / 1e6:.1f} MB"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sample", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out-dir", help="keep the trained global model here instead of a temporary directory")
+    args = ap.parse_args()
+
+    out_dir = args.out_dir or tempfile.mkdtemp(prefix="compare_models.")
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        compare(args, out_dir)
+    finally:
+        if not args.out_dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def compare(args, out_dir):
+    series = {k: s for k, s in load_training_series().items() if s is not None and len(s) >= SEQ_LEN + PRED_HORIZON + 10}
+    pairs = sorted(series)
+    print(f"{len(pairs)} state–crop series with enough history\n")
+
+    # --- training time ---
+    sample = random.sample(pairs, min(args.sample, len(pairs)))
+    t0 = time.perf_counter()
+    for key in sample:
+        scaled, _ = scale_series(series[key])
+        build_model().fit(WindowSequence(scaled, SEQ_LEN, PRED_HORIZON, BATCH_SIZE, shuffle=True), epochs=EPOCHS, verbose=0,
+                          callbacks=[EarlyStopping(monitor="loss", patience=6, restore_best_weights=True)])
+    per_pair_train = (time.perf_counter() - t0) / max(len(sample), 1) * len(pairs)
+
+    t0 = time.perf_counter()
+    train_global_model(series, out_dir=out_dir)
+    global_train = time.perf_counter() - t0
+    model_path, meta_path = model_paths(out_dir)
+
+    # --- model memory ---
+    pair_files = glob.glob(os.path.join(MODELS_DIR, "*__model.h5"))
+    pair_files = [f for f in pair_files if not os.path.basename(f).startswith("global__")]
+    pair_params = build_model().count_params()
+    gmodel = load_model(model_path, compile=False)
+    with open(meta_path) as f:
+        gmeta = json.load(f)
+
+    # --- prediction latency (rollout of PRED_HORIZON days, direct-call path) ---
+    served = [tuple(os.path.basename(f).split("__")[:2]) for f in pair_files[:20]]
+    seeds = {k: np.random.randn(SEQ_LEN).astype(np.float32) for k in pairs + served}
+
+    def timed(fn):
+        fn()  # warm
+        t = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        return (time.perf_counter() - t) / args.repeat
+
+    pair_lat = [timed(lambda k=k: rollout(get_predictor(*k)[0], seeds[k], PRED_HORIZON)) for k in served[:20]]
+    one_global = predict_fn_from(gmodel, gmeta, [pairs[0]])
+    g_single = timed(lambda: rollout(one_global, seeds[pairs[0]], PRED_HORIZON))
+    all_global = predict_fn_from(gmodel, gmeta, pairs)
+    g_all = timed(lambda: rollout(all_global, [seeds[k] for k in pairs], PRED_HORIZON))
+
+    rows = [
+        ("training time (all pairs)", f"{per_pair_train:,.0f} s (extrapolated from {len(sample)})", f"{global_train:,.0f} s"),
+        ("models / files", f"{len(pair_files)} .h5 + scalers", "1 .h5 + meta json"),
+        ("weights on disk", _mb(sum(os.path.getsize(f) for f in pair_files)), _mb(os.path.getsize(model_path))),
+        ("weights in memory (float32)", _mb(pair_params * 4 * len(pairs)), _mb(gmodel.count_params() * 4)),
+        ("latency, one forecast", f"{1000 * np.mean(pair_lat):.2f} ms" if pair_lat else "n/a", f"{1000 * g_single:.2f} ms"),
+        ("latency, every pair", f"{1000 * np.mean(pair_lat) * len(pairs):.1f} ms ({len(pairs)} calls)" if pair_lat else "n/a",
+         f"{1000 * g_all:.1f} ms (1 batched call)"),
+    ]
+    w = max(len(r[0]) for r in rows)
+    print(f"{'':<{w}}  {'per-pair':<40} global")
+    for name, a, b in rows:
+        print(f"{name:<{w}}  {a:<40} {b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,3 +22,67 @@ TOPCROPS_JSON = os.path.join(DATA_DIR, "top_crops_by_district.json")
 # Agmarknet bulk URL (update if needed)
 AGMARKNET_BULK_URL = os.environ.get("AGMARKNET_BULK_URL",
     "https://data.gov.in/sites/default/files/commodity_daily_prices_agmarknet.csv")
+
+# Process role: "all" serves every endpoint, "meta" only the lightweight
+# catalog/auth/market/chatbot ones (no prediction, ingest or training routes),
+# "market" only the market routes (dealer streams/long-polls, on an async worker)
+ROLE = os.environ.get("KM_ROLE", "all")
+
+# Serving
+WEB_THREADS = int(os.environ.get("KM_WEB_THREADS", 8))            # request threads per gunicorn worker
+MODEL_CACHE_SIZE = int(os.environ.get("KM_MODEL_CACHE_SIZE", 32))  # max (state, crop) pairs kept loaded
+MAX_ROLLOUT_DAYS = int(os.environ.get("KM_MAX_ROLLOUT_DAYS", 366))  # furthest forecast day past history end
+MAX_BATCH_TARGETS = int(os.environ.get("KM_MAX_BATCH_TARGETS", 50))
+FORECAST_CACHE_SIZE = int(os.environ.get("KM_FORECAST_CACHE_SIZE", 2048))
+FORECAST_CACHE_TTL = int(os.environ.get("KM_FORECAST_CACHE_TTL", 600))  # seconds
+FORECAST_CACHE_MONGO = os.environ.get("KM_FORECAST_CACHE_MONGO", "0") == "1"  # share results across workers
+GZIP_MIN_BYTES = int(os.environ.get("KM_GZIP_MIN_BYTES", 1024))     # compress JSON bodies at least this large
+CATALOG_MAX_AGE = int(os.environ.get("KM_CATALOG_MAX_AGE", 300))    # seconds clients may reuse catalog responses
+INFERENCE_ENGINE = os.environ.get("KM_INFERENCE_ENGINE", "numpy")  # "numpy" (no TF import) or "keras"
+PRELOAD_MODELS = int(os.environ.get("KM_PRELOAD_MODELS", 32))      # popular models loaded + warmed at startup
+MICROBATCH_WAIT_MS = float(os.environ.get("KM_MICROBATCH_WAIT_MS", 5))  # max wait to merge concurrent rollouts on a model (0 = off)
+MICROBATCH_MAX = int(os.environ.get("KM_MICROBATCH_MAX", 64))          # rows that trigger a merged forward pass at once
+
+# Ingest
+INGEST_CHUNK = int(os.environ.get("KM_INGEST_CHUNK", 50000))    # CSV rows read per chunk
+INGEST_BATCH = int(os.environ.get("KM_INGEST_BATCH", 2000))     # docs per insert_many
+INGEST_WRITERS = int(os.environ.get("KM_INGEST_WRITERS", 4))    # concurrent writer threads
+TOP_CROPS_N = int(os.environ.get("KM_TOP_CROPS", 12))          # crops kept per district in top_crops
+CATALOG_CHECK_SECONDS = float(os.environ.get("KM_CATALOG_CHECK_SECONDS", 5))  # how often workers poll the catalog version
+
+# Training scheduler
+TRAIN_WORKERS = int(os.environ.get("KM_TRAIN_WORKERS", 2))                # concurrent training processes (whole deployment)
+TRAIN_TF_THREADS = int(os.environ.get("KM_TRAIN_TF_THREADS", 2))          # TF intra-op threads per worker
+TRAIN_JOBS_PER_WORKER = int(os.environ.get("KM_TRAIN_JOBS_PER_WORKER", 10))  # recycle a worker after N jobs
+TRAIN_POLL_SECONDS = float(os.environ.get("KM_TRAIN_POLL_SECONDS", 2))     # scheduler: claim queued jobs / renew lease
+TRAIN_LEASE_SECONDS = int(os.environ.get("KM_TRAIN_LEASE_SECONDS", 30))    # a dead scheduler's lease is taken over after this
+
+# Market: sell intents live in "memory" (per process) or "mongo" (shared by all workers)
+INTENT_STORE = os.environ.get("KM_INTENT_STORE", "memory")
+INTENT_TTL_SECONDS = int(os.environ.get("KM_INTENT_TTL", 300))  # 5 minutes
+INTENT_POLL_SECONDS = float(os.environ.get("KM_INTENT_POLL_SECONDS", 2))  # mongo store: how often the stream picks up other workers' intents
+STREAM_HEARTBEAT_SECONDS = int(os.environ.get("KM_STREAM_HEARTBEAT", 15))  # SSE keep-alive comment interval
+LONG_POLL_SECONDS = int(os.environ.get("KM_LONG_POLL_SECONDS", 25))        # max wait of the long-poll fallback
+# streams + long-polls open at once per process (0 = unlimited). Each holds a request thread on
+# threaded workers, so outside the async KM_ROLE=market process only a few are allowed.
+STREAM_SLOTS = int(os.environ.get("KM_STREAM_SLOTS", 0 if ROLE == "market" else max(1, WEB_THREADS // 4)))
+
+DEALER_CACHE_TTL = int(os.environ.get("KM_DEALER_CACHE_TTL", 60))   # seconds a district's dealer list is reused
+DEALER_PAGE_SIZE = int(os.environ.get("KM_DEALER_PAGE_SIZE", 100))  # /api/auth/dealers default page
+DEALER_PAGE_MAX = int(os.environ.get("KM_DEALER_PAGE_MAX", 500))
+
+# Auth
+AUTH_HASH_WORKERS = int(os.environ.get("KM_AUTH_HASH_WORKERS", 2))      # threads hashing/verifying passwords
+AUTH_HASH_QUEUE = int(os.environ.get("KM_AUTH_HASH_QUEUE", max(1, WEB_THREADS // 2)))  # hashes admitted at once before 503; keep below WEB_THREADS
+AUTH_HASH_TIMEOUT = float(os.environ.get("KM_AUTH_HASH_TIMEOUT", 10))   # seconds
+PROFILE_CACHE_TTL = int(os.environ.get("KM_PROFILE_CACHE_TTL", 300))
+PROFILE_CACHE_SIZE = int(os.environ.get("KM_PROFILE_CACHE_SIZE", 10000))
+
+# Chatbot FAQs: "file" (KM_FAQ_PATH) or "mongo" (`faqs` collection)
+FAQ_SOURCE = os.environ.get("KM_FAQ_SOURCE", "file")
+FAQ_PATH = os.environ.get("KM_FAQ_PATH", os.path.join(DATA_DIR, "faqs.json"))
+FAQ_CHECK_SECONDS = float(os.environ.get("KM_FAQ_CHECK_SECONDS", 10))  # how often the source is checked for changes
+
+# Forecast model: "pair" = one LSTM per (state, crop), "global" = one multi-series model
+FORECAST_MODE = os.environ.get("KM_FORECAST_MODE", "pair")
+GLOBAL_EMBED_DIM = int(os.environ.get("KM_GLOBAL_EMBED_DIM", 8))
@@ -0,0 +1,54 @@
+# backend/export_numpy_models.py
+"""
+Export every per-pair .h5 model to the .npz weights numpy_lstm serves from,
+and check the NumPy forward pass against Keras.
+
+    python export_numpy_models.py [--check] [--batch 16] [--tol 1e-4]
+
+Export only needs h5py. --check loads each model with TensorFlow as well and
+compares the outputs on random windows plus a multi-step rollout; exits
+non-zero if any model differs by more than --tol. This is the NumPy/Keras
+parity test: run it after changing numpy_lstm or the model architecture.
+"""
+import os, sys, glob, argparse
+import numpy as np
+from config import MODELS_DIR, SEQ_LEN, PRED_HORIZON
+from services import numpy_lstm
+from services.rollout_service import rollout, keras_predict_fn
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", action="store_true")
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--tol", type=float, default=1e-4)
+    args = ap.parse_args()
+
+    paths = sorted(p for p in glob.glob(os.path.join(MODELS_DIR, "*__model.h5"))
+                   if not os.path.basename(p).startswith("global__"))
+    rng = np.random.default_rng(0)
+    worst, failed = 0.0, []
+    for path in paths:
+        numpy_lstm.export_h5(path)
+        if not args.check:
+            continue
+        from tensorflow.keras.models import load_model
+        keras = keras_predict_fn(load_model(path, compile=False))
+        ours = numpy_lstm.load(path)
+        X = rng.standard_normal((args.batch, SEQ_LEN, 1)).astype(np.float32)
+        diff = float(np.max(np.abs(keras(X) - ours(X))))
+        seeds = X[:, :, 0]
+        diff = max(diff, float(np.max(np.abs(rollout(keras, seeds, 4 * PRED_HORIZON) - rollout(ours, seeds, 4 * PRED_HORIZON)))))
+        worst = max(worst, diff)
+        if diff > args.tol:
+            failed.append((os.path.basename(path), diff))
+    print(f"exported {len(paths)} models to .npz")
+    if args.check:
+        print(f"max abs difference vs Keras: {worst:.2e} (tol {args.tol:g})")
+        for name, diff in failed:
+            print(f"  MISMATCH {name}: {diff:.2e}")
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
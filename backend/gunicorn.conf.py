@@ -0,0 +1,70 @@
+# backend/gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Two kinds of process:
+#   KM_ROLE=all (or meta): gthread workers. Every request holds one of
+#     KM_WEB_THREADS threads until it finishes, so dealer streams/long-polls are
+#     capped per process (KM_STREAM_SLOTS) and belong on the market process.
+#   KM_ROLE=market: the market routes on a gevent worker, where an open SSE
+#     stream or long-poll costs a greenlet, not a thread. Route
+#     /api/market/* to it at the reverse proxy.
+import os, multiprocessing
+
+# The memory intent store is per process: with several workers a sell intent
+# and the dealer-view reading it land on different workers. Default to the
+# shared Mongo store then (before config is imported), and refuse an explicit
+# KM_INTENT_STORE=memory (see on_starting).
+# One gevent worker holds plenty of market connections.
+_market = os.environ.get("KM_ROLE", "all") == "market"
+workers = int(os.environ.get("KM_WEB_WORKERS", 1 if _market else multiprocessing.cpu_count()))
+if workers > 1:
+    os.environ.setdefault("KM_INTENT_STORE", "mongo")
+
+from config import ROLE, WEB_THREADS, INTENT_STORE
+
+bind = os.environ.get("KM_BIND", "0.0.0.0:5000")
+timeout = int(os.environ.get("KM_WEB_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("KM_WEB_MAX_REQUESTS", 0))  # 0 = never recycle workers
+max_requests_jitter = max_requests // 10
+
+if ROLE == "market":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("KM_WEB_CONNECTIONS", 2000))
+    # gevent patches the stdlib when the worker starts; the app must be imported after that
+    preload_app = False
+else:
+    worker_class = "gthread"
+    threads = WEB_THREADS
+    # load the app (and preload/warm the popular models) in the master before forking
+    preload_app = True
+    os.environ.setdefault("KM_WARMUP_BLOCKING", "1")
+
+
+def on_starting(server):
+    # also catches -w/--workers on the command line, which overrides `workers` above
+    if INTENT_STORE == "memory" and server.cfg.workers > 1:
+        raise SystemExit("KM_INTENT_STORE=memory needs a single worker (each worker would only see its own "
+                         "sell intents); use KM_INTENT_STORE=mongo or KM_WEB_WORKERS=1")
+
+
+def post_fork(server, worker):
+    # the master may have opened a MongoClient (startup index check); each worker needs its own.
+    # Without preload there is none, and gevent workers must not import pymongo before patching.
+    if not preload_app:
+        return
+    from services import mongo_client
+    mongo_client.reset()
+
+
+def post_worker_init(worker):
+    # cheap once the master preloaded (cache hits); loads per worker for the keras engine.
+    # Runs before the worker accepts connections, so /api/ready is 200 from its first request.
+    from services import warmup_service
+    warmup_service.start(blocking=True)
+    if ROLE == "all":
+        # per worker, never in the master: one of them holds the training lease, and a
+        # worker taking it over from a recycled/killed one fails the jobs that died with it
+        from services.train_scheduler import start_scheduler
+        start_scheduler()
@@ -0,0 +1,58 @@
+# backend/import_profile.py
+"""
+Import-time breakdown of `import app`, measured with `python -X importtime`
+in a fresh interpreter.
+
+    python import_profile.py [--role all|meta] [--top 15] [--budget-ms 0]
+
+Prints the total for `app` and the slowest top-level packages (cumulative time, so
+e.g. `pandas` includes everything pandas imports). With --budget-ms the
+script exits non-zero when the total is over budget, to catch startup
+regressions.
+"""
+import os, sys, argparse, subprocess
+
+
+def measure(role):
+    env = {**os.environ, "KM_ROLE": role}
+    env.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017/krishimitra")  # never contacted at import
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+
+    total, packages = 0, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        name, us = name.strip(), int(cumulative)
+        if name == "app":
+            total = us
+            continue
+        top = name.split(".")[0]
+        packages[top] = max(packages.get(top, 0), us)
+    return total / 1000, {k: v / 1000 for k, v in packages.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--role", default=os.environ.get("KM_ROLE", "all"))
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=0)
+    args = ap.parse_args()
+
+    total, packages = measure(args.role)
+    print(f"import app (KM_ROLE={args.role}): {total:.0f} ms")
+    for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if args.budget_ms and total > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# backend/migrate.py
+import sys
+from services.indexes import ensure_indexes, migrate_commodity_keys, dedupe_crops, explain_hot_queries
+from services.series_service import rebuild_all_series
+from services.ingest_service import generate_top_crops
+
+def main():
+    n = migrate_commodity_keys()
+    print(f"✅ Set or repaired commodity_key on {n} crops documents")
+    n = dedupe_crops()
+    print(f"✅ Removed {n} duplicate (state, district, commodity, date) documents")
+    ensure_indexes(replace_conflicting=True)
+    print("✅ Indexes ensured")
+    pairs = rebuild_all_series()
+    print(f"✅ Rebuilt materialised series for {pairs} state–crop pairs")
+    generate_top_crops()
+
+    # optional: python migrate.py <state> <district> <crop>  -> explain-plan check
+    if len(sys.argv) == 4:
+        for name, r in explain_hot_queries(*sys.argv[1:]).items():
+            mark = "✅" if r["indexed"] and not r["collscan"] else "❌"
+            print(f"{mark} {name}: {' <- '.join(s for s in r['stages'] if s)}")
+
+if __name__ == "__main__":
+    main()
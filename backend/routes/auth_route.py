@@ -1,8 +1,9 @@
 # backend/routes/auth_route.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from services.mongo_client import db
+from services import dealer_service
+from services.auth_service import AuthBusy, hash_password, verify_password, profile_claims, get_profile
 from bson.objectid import ObjectId
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/api/auth")
@@ -26,7 +27,7 @@ def register():
         if db.users.find_one({"email": email}):
             return jsonify({"message": "User already exists"}), 400
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         user_doc = {
             "name": name,
             "email": email,
@@ -37,7 +38,10 @@ def register():
         }
 
         result = db.users.insert_one(user_doc)
-        access_token = create_access_token(identity=str(result.inserted_id))
+        if role == "dealer":
+            dealer_service.invalidate(district_preferences)
+        access_token = create_access_token(identity=str(result.inserted_id),
+                                           additional_claims=profile_claims(user_doc))
 
         return jsonify({
             "_id": str(result.inserted_id),
@@ -49,6 +53,8 @@ def register():
             "token": access_token
         }), 201
 
+    except AuthBusy as e:
+        return jsonify({"message": str(e)}), 503
     except Exception as e:
         return jsonify({"message": "Signup failed", "error": str(e)}), 500
 
@@ -65,10 +71,10 @@ def login():
             return jsonify({"message": "Email and password required"}), 400
 
         user = db.users.find_one({"email": email})
-        if not user or not check_password_hash(user["password"], password):
+        if not user or not verify_password(user["password"], password):
             return jsonify({"message": "Invalid email or password"}), 400
 
-        access_token = create_access_token(identity=str(user["_id"]))
+        access_token = create_access_token(identity=str(user["_id"]), additional_claims=profile_claims(user))
         return jsonify({
             "_id": str(user["_id"]),
             "name": user["name"],
@@ -79,6 +85,8 @@ def login():
             "token": access_token
         })
 
+    except AuthBusy as e:
+        return jsonify({"message": str(e)}), 503
     except Exception as e:
         return jsonify({"message": "Login failed", "error": str(e)}), 500
 
@@ -89,36 +97,56 @@ def login():
 def get_me():
     try:
         user_id = get_jwt_identity()
-        user = db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
-        if not user:
+        # tokens carry the profile since login/register embed it; no DB read
+        profile = get_jwt().get("profile")
+        if profile is None:
+            # token issued before profile claims: cached lookup
+            profile = get_profile(user_id, _load_profile)
+        if profile is None:
             return jsonify({"message": "User not found"}), 404
-        user["_id"] = str(user["_id"])
-        return jsonify(user)
+        return jsonify({"_id": user_id, **profile})
     except Exception as e:
         return jsonify({"message": "Failed to fetch user", "error": str(e)}), 500
 
 
+def _load_profile(user_id):
+    return db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0, "_id": 0})
+
+
 # ---------------- DEALERS LIST ---------------- #
 @auth_bp.route("/dealers", methods=["GET"])
 def get_dealers():
     """
     Fetch dealers, optionally filtered by state/district.
     Example: /api/auth/dealers?district=Patna
+    Without ?limit / ?cursor the whole list is returned, as before paging.
+    Paged: ?limit=N (default KM_DEALER_PAGE_SIZE) and ?cursor=<X-Next-Cursor
+    of the previous page>; the X-Next-Cursor header is absent on the last page.
     """
     try:
         state = request.args.get("state")
         district = request.args.get("district")
 
-        query = {"role": "dealer"}
+        districts = None
         if district:
-            query["districtPreferences"] = {"$in": [district]}
+            districts = [district]
         if state:
-            query["districtPreferences"] = {"$in": [district]}  # optional, can expand later
-
-        dealers = list(db.users.find(query, {"password": 0}))
-        for d in dealers:
-            d["_id"] = str(d["_id"])
-
-        return jsonify(dealers)
+            # dealers preferring any district of the state (catalog), narrowed to `district` if given
+            from services.catalog_service import get_catalog
+            in_state = get_catalog().districts(state)
+            districts = [d for d in districts if d in in_state] if districts else in_state
+
+        if "limit" not in request.args and "cursor" not in request.args:
+            return jsonify(dealer_service.dealer_list(districts))
+        try:
+            dealers, next_cursor = dealer_service.dealer_page(
+                districts, cursor=request.args.get("cursor"), limit=request.args.get("limit", type=int))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        resp = jsonify(dealers)
+        if next_cursor:
+            resp.headers["X-Next-Cursor"] = next_cursor
+        return resp
     except Exception as e:
         return jsonify({"message": "Failed to fetch dealers", "error": str(e)}), 500
@@ -1,6 +1,8 @@
 # backend/routes/crops_route.py
-from flask import Blueprint, jsonify, request
-from services.mongo_client import db
+from flask import Blueprint, request
+from services.catalog_service import get_catalog
+from services.http_cache import json_response, make_etag
+from config import CATALOG_MAX_AGE
 
 bp = Blueprint('crops', __name__, url_prefix='/api')
 
@@ -8,13 +10,10 @@ bp = Blueprint('crops', __name__, url_prefix='/api')
 def crops():
     state = request.args.get('state','').strip()
     district = request.args.get('district','').strip()
-    if state and district:
-        rec = db.top_crops.find_one({"state":state,"district":district})
-        if rec:
-            return jsonify({"crops": rec['top_crops']})
-    # fallback: union of top crops
-    cursor = db.top_crops.find({})
-    s = set()
-    for r in cursor:
-        s.update(r.get('top_crops',[]))
-    return jsonify({"crops": sorted(list(s))})
+    catalog = get_catalog()
+    crops = catalog.top_crops(state, district) if state and district else None
+    if not crops:
+        # fallback: union of top crops
+        crops = catalog.all_top_crops
+    return json_response({"crops": crops}, etag=make_etag("catalog", catalog.version),
+                         max_age=CATALOG_MAX_AGE, last_modified=catalog.updated_at)
@@ -1,13 +1,13 @@
 # backend/routes/ingest_route.py
-from flask import Blueprint, jsonify
-from services.ingest_service import run_full_ingest
+from flask import Blueprint, jsonify, request
 
 bp = Blueprint('ingest', __name__, url_prefix='/api')
 
 @bp.route('/ingest', methods=['POST'])
 def ingest():
+    from services.ingest_service import run_full_ingest  # pandas; only needed here
     try:
-        ok = run_full_ingest()
-        return jsonify({"status":"ok"}) if ok else (jsonify({"status":"failed"}), 500)
+        stats = run_full_ingest(force=request.args.get('force') == '1')
+        return jsonify({"status":"ok","stats":stats}) if stats else (jsonify({"status":"failed"}), 500)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,13 +1,33 @@
 # backend/routes/market_route.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from services.mongo_client import db
-import time
+from services.intent_store import store as intents
+from services.intent_bus import bus
+from services import dealer_service
+from config import STREAM_HEARTBEAT_SECONDS, LONG_POLL_SECONDS, STREAM_SLOTS
+import json, queue, threading, time
 
 bp = Blueprint("market", __name__, url_prefix="/api/market")
 
-# Temporary in-memory store of active sell intents
-active_farmers = []
-EXPIRY_SECONDS = 300  # 5 minutes
+# Streams and long-polls hold their connection (a whole request thread on
+# gthread workers); past KM_STREAM_SLOTS they get 503 + Retry-After so they
+# cannot starve predict/catalog requests. Route them to the KM_ROLE=market process.
+_stream_slots = threading.BoundedSemaphore(STREAM_SLOTS) if STREAM_SLOTS > 0 else None
+
+
+def _acquire_stream_slot():
+    return _stream_slots is None or _stream_slots.acquire(blocking=False)
+
+
+def _release_stream_slot():
+    if _stream_slots is not None:
+        _stream_slots.release()
+
+
+def _streams_busy():
+    resp = jsonify({"error": "too many open dealer streams on this server, retry later"})
+    resp.headers["Retry-After"] = "5"
+    return resp, 503
 
 
 @bp.route("/sell-intent", methods=["POST"])
@@ -29,8 +49,8 @@ def sell_intent():
     if not district or not crop:
         return jsonify({"error": "District and crop are required"}), 400
 
-    # Store farmer intent in memory (not DB) with timestamp
-    farmer_entry = {
+    # Store farmer intent (expires after KM_INTENT_TTL, see intent_store)
+    intent = intents.add({
         "name": farmer_name,
         "contact": farmer_contact,
         "email": farmer_email,
@@ -38,20 +58,11 @@ def sell_intent():
         "district": district,
         "crop": crop,
         "price": price,
-        "timestamp": time.time(),  # ✅ store post time
-    }
-    active_farmers.append(farmer_entry)
-
-    # Cleanup expired farmers
-    _cleanup_expired()
+    })
+    bus.publish_new(intent)  # push to dealers streaming this district
 
     # Find all dealers who are interested in this district (using districtPreferences)
-    dealers = list(
-        db.users.find(
-            {"role": "dealer", "districtPreferences": {"$in": [district]}},
-            {"password": 0, "_id": 0}  # exclude sensitive fields
-        )
-    )
+    dealers = dealer_service.dealers_for_district(district)
 
     return jsonify({"dealers": dealers})
 
@@ -60,38 +71,131 @@ def sell_intent():
 def dealer_view(dealer_email):
     """
     Dealer pulls all active farmers whose district is in dealer's districtPreferences.
-    Expired requests (older than 5 minutes) are automatically removed.
+    Expired requests (older than KM_INTENT_TTL, 5 minutes by default) are not returned.
     """
-    dealer = db.users.find_one({"role": "dealer", "email": dealer_email})
-    if not dealer:
+    preferred_districts = _dealer_districts(dealer_email)
+    if preferred_districts is None:
         return jsonify({"error": "Dealer not found"}), 404
 
-    # Cleanup expired farmers
-    _cleanup_expired()
-
-    preferred_districts = dealer.get("districtPreferences", [])
-    now = time.time()
-
-    matching_farmers = []
-    for f in active_farmers:
-        if f.get("district") in preferred_districts:
-            minutes_ago = int((now - f["timestamp"]) // 60)
-            if minutes_ago == 0:
-                posted = "Just now"
-            else:
-                posted = f"Posted {minutes_ago} min ago"
+    # only intents in the dealer's districts are read (district index)
+    return jsonify({"farmers": _annotate(intents.for_districts(preferred_districts))})
 
-            f_copy = f.copy()
-            f_copy["posted"] = posted  # ✅ add freshness info
-            matching_farmers.append(f_copy)
 
-    return jsonify({"farmers": matching_farmers})
+@bp.route("/dealer-stream/<dealer_email>", methods=["GET"])
+def dealer_stream(dealer_email):
+    """
+    Server-Sent Events stream of intents in the dealer's districtPreferences.
+    Sends a "snapshot" event ({"farmers": [...]}) first, then "new" (intent)
+    and "expired" ({"id", "district"}) events as they happen, plus a keep-alive
+    comment every KM_STREAM_HEARTBEAT seconds. A reconnecting EventSource
+    (Last-Event-ID) gets the missed events instead of a new snapshot when they
+    are still in the log and it reconnected to the same worker (event ids are
+    per-process cursors, see intent_bus). Served by the KM_ROLE=market process
+    (gevent worker) in production; elsewhere limited to KM_STREAM_SLOTS streams.
+    """
+    districts = _dealer_districts(dealer_email)
+    if districts is None:
+        return jsonify({"error": "Dealer not found"}), 404
+    if not _acquire_stream_slot():
+        return _streams_busy()
+
+    last_seq = bus.parse_cursor(request.headers.get("Last-Event-ID") or request.args.get("since"))
+    sub = bus.subscribe(districts)  # before reading state, so nothing posted meanwhile is missed
+    backlog = bus.since(last_seq, districts)
+
+    def events():
+        if backlog is None:
+            sent = bus.seq
+            yield _sse("snapshot", {"farmers": _annotate(intents.for_districts(districts))}, sent)
+        else:
+            sent = last_seq
+            for e in backlog:
+                sent = e["seq"]
+                yield _sse(e["type"], e["intent"], e["seq"])
+        while True:
+            try:
+                e = sub.queue.get(timeout=STREAM_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if sub.overflow:
+                # this client fell behind and events were dropped: resend the full state
+                sub.overflow = False
+                sent = bus.seq
+                yield _sse("snapshot", {"farmers": _annotate(intents.for_districts(districts))}, sent)
+                continue
+            if e["seq"] > sent:
+                sent = e["seq"]
+                yield _sse(e["type"], e["intent"], e["seq"])
+
+    resp = Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    def close():
+        bus.unsubscribe(sub)
+        _release_stream_slot()
+
+    # runs even if the body was never iterated (client gone before the first chunk)
+    resp.call_on_close(close)
+    return resp
+
+
+@bp.route("/dealer-poll/<dealer_email>", methods=["GET"])
+def dealer_poll(dealer_email):
+    """
+    Long-poll fallback for clients without EventSource.
+    Without ?since= returns {"cursor", "reset": true, "farmers": [...]}. With
+    ?since=<cursor> returns {"cursor", "events": [...]} as soon as there are
+    events after the cursor, or an empty list after ?timeout= seconds
+    (at most KM_LONG_POLL_SECONDS). "reset" means the cursor is too old or
+    was issued by another worker: start over from the returned state.
+    """
+    districts = _dealer_districts(dealer_email)
+    if districts is None:
+        return jsonify({"error": "Dealer not found"}), 404
+    since = bus.parse_cursor(request.args.get("since"))
+    timeout = min(max(request.args.get("timeout", LONG_POLL_SECONDS, type=float), 0.0), LONG_POLL_SECONDS)
+    if not _acquire_stream_slot():
+        return _streams_busy()
+
+    sub = bus.subscribe(districts)
+    try:
+        events = bus.since(since, districts)
+        if events is None:
+            return jsonify({"cursor": bus.cursor(), "reset": True,
+                            "farmers": _annotate(intents.for_districts(districts))})
+        if not events:
+            try:
+                events = [sub.queue.get(timeout=timeout)]
+                while True:
+                    events.append(sub.queue.get_nowait())
+            except queue.Empty:
+                pass
+        events = [e for e in events if e["seq"] > since]
+        return jsonify({"cursor": bus.cursor(max([since] + [e["seq"] for e in events])), "events": events})
+    finally:
+        bus.unsubscribe(sub)
+        _release_stream_slot()
+
+
+def _dealer_districts(dealer_email):
+    """The dealer's districtPreferences, or None if there is no such dealer."""
+    dealer = db.users.find_one({"role": "dealer", "email": dealer_email}, {"districtPreferences": 1})
+    if not dealer:
+        return None
+    return dealer.get("districtPreferences") or []
 
 
-def _cleanup_expired():
-    """Remove farmer entries older than EXPIRY_SECONDS (5 minutes)."""
-    global active_farmers
+def _annotate(farmers):
     now = time.time()
-    active_farmers = [
-        f for f in active_farmers if now - f["timestamp"] <= EXPIRY_SECONDS
-    ]
+    for f in farmers:
+        minutes_ago = int((now - f["timestamp"]) // 60)
+        if minutes_ago == 0:
+            posted = "Just now"
+        else:
+            posted = f"Posted {minutes_ago} min ago"
+        f["posted"] = posted  # ✅ add freshness info
+    return farmers
+
+
+def _sse(event, data, seq):
+    return f"id: {bus.cursor(seq)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,6 +1,9 @@
 # backend/routes/predict_route.py
 from flask import Blueprint, jsonify, request
-from services.predict_service import predict_state_crop
+from services.http_cache import json_response, make_etag, not_modified
+
+# services are imported inside the handlers: predict_service pulls in pandas,
+# scikit-learn (scalers) and the model registry, which should not be paid for at startup
 
 bp = Blueprint('predict', __name__, url_prefix='/api')
 
@@ -12,5 +15,36 @@ def predict():
     date = request.args.get('date')  # optional
     if not state or not crop:
         return jsonify({"error":"state and crop required"}), 400
-    res = predict_state_crop(state, district, crop, as_of_date=date)
-    return jsonify(res)
+    from services.predict_service import predict_state_crop
+
+    # ETag = forecast inputs + model version (+ the echoed request fields);
+    # a client that already holds it gets a 304 without a rollout
+    etag = {}
+    def unchanged(key):
+        etag["value"] = make_etag(key, district, crop)
+        return not_modified(etag["value"])
+
+    res = predict_state_crop(state, district, crop, as_of_date=date, on_version=unchanged)
+    return json_response(res, etag=etag.get("value") if res is None or "error" not in res else None)
+
+@bp.route('/predict/batch', methods=['POST'])
+def predict_many():
+    body = request.get_json(silent=True) or {}
+    targets = body.get('targets')
+    if not isinstance(targets, list) or not targets:
+        return jsonify({"error":"targets (non-empty list of {state, district, crop, date}) required"}), 400
+    from services.predict_service import predict_batch
+    try:
+        results = predict_batch(targets)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": results})
+
+@bp.route('/predict/stats', methods=['GET'])
+def predict_stats():
+    from services.model_registry import registry_stats
+    from services.forecast_cache import cache_stats
+    from services.inference_batcher import batcher_stats
+    from services.predict_service import coalescing_stats
+    return jsonify({"models": registry_stats(), "forecasts": cache_stats(), "batching": batcher_stats(),
+                    "coalescing": coalescing_stats()})
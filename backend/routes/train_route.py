@@ -1,6 +1,6 @@
 # backend/routes/train_route.py
 from flask import Blueprint, request, jsonify
-from services.train_service import train_state_crop
+from services.train_scheduler import submit, submit_many, submit_global, job_status, batch_status
 
 bp = Blueprint('train', __name__, url_prefix='/api')
 
@@ -11,7 +11,42 @@ def train():
     crop = body.get('crop')
     if not state or not crop:
         return jsonify({"error":"state and crop required (JSON body)"}), 400
-    meta = train_state_crop(state, crop)
-    if meta:
-        return jsonify({"status":"trained","meta":meta})
-    return jsonify({"status":"failed"}), 500
+    job_id = submit(state, crop)
+    return jsonify({"status":"queued","job_id":job_id}), 202
+
+@bp.route('/train/bulk', methods=['POST'])
+def train_bulk():
+    """
+    Body: {"pairs": [[state, crop], ...]} or {"all": true} for every pair in the DB.
+    Returns at once: the data extraction runs as the batch's first job, which
+    then creates one training job per pair (see /train/batches/<batch_id>).
+    """
+    body = request.get_json() or {}
+    if body.get('all'):
+        pairs = None  # every pair found by the extraction pass
+    else:
+        pairs = [tuple(p) for p in body.get('pairs', []) if isinstance(p, (list, tuple)) and len(p) == 2 and all(p)]
+        if not pairs:
+            return jsonify({"error":"pairs ([[state, crop], ...]) or all=true required"}), 400
+    batch_id, extract_job_id = submit_many(pairs)
+    return jsonify({"status":"queued","batch_id":batch_id,"extract_job_id":extract_job_id}), 202
+
+@bp.route('/train/global', methods=['POST'])
+def train_global():
+    """Train the single multi-series model used when KM_FORECAST_MODE=global."""
+    job_id = submit_global()
+    return jsonify({"status":"queued","job_id":job_id}), 202
+
+@bp.route('/train/jobs/<job_id>', methods=['GET'])
+def train_job(job_id):
+    job = job_status(job_id)
+    if not job:
+        return jsonify({"error":"job not found"}), 404
+    return jsonify(job)
+
+@bp.route('/train/batches/<batch_id>', methods=['GET'])
+def train_batch(batch_id):
+    status = batch_status(batch_id)
+    if not status["total"]:
+        return jsonify({"error":"batch not found"}), 404
+    return jsonify(status)
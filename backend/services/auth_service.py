@@ -0,0 +1,93 @@
+# backend/services/auth_service.py
+import threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import AUTH_HASH_WORKERS, AUTH_HASH_QUEUE, AUTH_HASH_TIMEOUT, PROFILE_CACHE_TTL, PROFILE_CACHE_SIZE
+
+# Password hashing off the request threads, and user profiles without a Mongo read.
+#
+# pbkdf2 is deliberately slow (~100s of ms of CPU). It runs on a small pool of
+# AUTH_HASH_WORKERS threads with at most AUTH_HASH_QUEUE hashes admitted at a
+# time. Every admitted login/register holds a request thread while it waits,
+# so the bound defaults to half of KM_WEB_THREADS: the rest stay free for
+# predict/market requests, and further logins fail fast with AuthBusy (503).
+# A slot is released when its hash finishes, not when the caller stops
+# waiting, so hashes abandoned on timeout still count against the bound.
+#
+# Profiles (the user doc minus password) are embedded in the JWT as a
+# "profile" claim so /me needs no lookup; tokens issued before that use the
+# per-process TTL cache below.
+#
+# Both copies can go stale. A token's claim stays as issued until the token
+# expires (JWT_ACCESS_TOKEN_EXPIRES, 15 minutes by default), and a cached
+# profile lives for PROFILE_CACHE_TTL in every worker that loaded it. Any
+# code path that changes a user's profile fields must call invalidate(user_id)
+# and hand the client a new token built from profile_claims(updated_user);
+# other workers' cache entries still age out on their own.
+PROFILE_FIELDS = ("name", "email", "role", "contact", "districtPreferences")
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+_slots = threading.BoundedSemaphore(AUTH_HASH_QUEUE)
+
+_profiles = {}   # user_id -> (expires_at, profile)
+_profiles_lock = threading.Lock()
+
+
+class AuthBusy(Exception):
+    """Too many password hashes in flight; the client should retry."""
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy("authentication is busy, please retry")
+    try:
+        future = _executor.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=AUTH_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise AuthBusy("authentication timed out, please retry")
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password)
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def profile_claims(user):
+    """The JWT "profile" claim for a user doc."""
+    return {"profile": {k: user.get(k) for k in PROFILE_FIELDS}}
+
+
+def invalidate(user_id):
+    """Call after a user's profile changes (see the note at the top)."""
+    with _profiles_lock:
+        _profiles.pop(user_id, None)
+
+
+def get_profile(user_id, load):
+    """Cached profile for user_id; load(user_id) fetches it from Mongo on a miss (None if missing)."""
+    now = time.monotonic()
+    with _profiles_lock:
+        hit = _profiles.get(user_id)
+        if hit is not None and hit[0] > now:
+            return dict(hit[1])
+    profile = load(user_id)
+    if profile is None:
+        return None
+    with _profiles_lock:
+        _profiles[user_id] = (now + PROFILE_CACHE_TTL, profile)
+        if len(_profiles) > PROFILE_CACHE_SIZE:
+            # drop expired entries first, then the oldest ones
+            for k in [k for k, (exp, _) in _profiles.items() if exp <= now]:
+                del _profiles[k]
+            while len(_profiles) > PROFILE_CACHE_SIZE:
+                del _profiles[next(iter(_profiles))]
+    return dict(profile)
+
@@ -0,0 +1,99 @@
+# backend/services/catalog_service.py
+import threading, time, datetime
+from pymongo import ReturnDocument
+from services.mongo_client import db
+from config import CATALOG_CHECK_SECONDS
+
+# In-memory state -> district -> commodity catalog for the metadata endpoints.
+#
+# Built from the small crop_counts/top_crops collections (maintained by ingest)
+# rather than distinct() over crops, and held per process. The catalog version
+# lives in meta {_id: "catalog"}; ingest bumps it, and each process re-reads
+# that one document at most every KM_CATALOG_CHECK_SECONDS and rebuilds when it
+# moved. Requests in between are served from memory without touching Mongo.
+_META_ID = "catalog"
+_current = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+class Catalog:
+    def __init__(self, version, updated_at, tree, top):
+        self.version = version
+        self.updated_at = updated_at           # when ingest published this version (None before the first bump)
+        self._tree = tree                      # {state: {district: [commodity, ...]}}
+        self._top = top                        # {(state, district): [commodity, ...]}
+        self.states = sorted(tree)
+        self._districts = {st: sorted(d) for st, d in tree.items()}
+        self.all_top_crops = sorted({c for crops in top.values() for c in crops})
+
+    def districts(self, state):
+        return self._districts.get(state, [])
+
+    def crops(self, state, district):
+        return self._tree.get(state, {}).get(district, [])
+
+    def top_crops(self, state, district):
+        """Top crops of a district, or None if the district has no ranking."""
+        return self._top.get((state, district))
+
+
+def _version():
+    doc = db.meta.find_one({"_id": _META_ID}, {"version": 1, "updated_at": 1})
+    return (doc["version"], doc.get("updated_at")) if doc else (0, None)
+
+
+def _build(version, updated_at):
+    tree = {}
+
+    def add(st, dist, name):
+        if isinstance(st, str) and st and isinstance(dist, str) and dist and isinstance(name, str) and name:
+            tree.setdefault(st, {}).setdefault(dist, set()).add(name)
+
+    for r in db.crop_counts.find({}, {"_id": 0, "state": 1, "district": 1, "commodity": 1}):
+        add(r.get("state"), r.get("district"), r.get("commodity"))
+    if not tree:
+        # crop_counts not built yet (pre-migration database)
+        for r in db.crops.aggregate([{"$group": {"_id": {"state": "$state", "district": "$district",
+                                                         "commodity": "$commodity"}}}], allowDiskUse=True):
+            add(r["_id"].get("state"), r["_id"].get("district"), r["_id"].get("commodity"))
+
+    tree = {st: {dist: sorted(names) for dist, names in dists.items()} for st, dists in tree.items()}
+    top = {(r["state"], r["district"]): r.get("top_crops", [])
+           for r in db.top_crops.find({}, {"_id": 0, "state": 1, "district": 1, "top_crops": 1})}
+    return Catalog(version, updated_at, tree, top)
+
+
+def get_catalog():
+    """The current Catalog, rebuilt when another process bumped the version."""
+    global _current, _checked
+    cat = _current
+    if cat is not None and time.monotonic() - _checked < CATALOG_CHECK_SECONDS:
+        return cat
+    # one thread checks/rebuilds; while it does, others keep the previous catalog
+    if not _lock.acquire(blocking=cat is None):
+        return cat
+    try:
+        if _current is not None and time.monotonic() - _checked < CATALOG_CHECK_SECONDS:
+            return _current
+        version, updated_at = _version()
+        if _current is None or _current.version != version:
+            _current = _build(version, updated_at)
+        _checked = time.monotonic()
+        return _current
+    finally:
+        _lock.release()
+
+
+def bump_version():
+    """Called after ingest changes crops: publish a new version and rebuild this process's copy."""
+    global _current, _checked
+    doc = db.meta.find_one_and_update(
+        {"_id": _META_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.datetime.utcnow()}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    with _lock:
+        _current = _build(doc["version"], doc["updated_at"])
+        _checked = time.monotonic()
+    return doc["version"]
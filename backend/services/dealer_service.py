@@ -0,0 +1,79 @@
+# backend/services/dealer_service.py
+import threading, time
+from bson.objectid import ObjectId
+from services.mongo_client import db
+from config import DEALER_CACHE_TTL, DEALER_PAGE_SIZE, DEALER_PAGE_MAX
+
+# Dealer lookups by district.
+#
+# Served by the multikey users (role, districtPreferences, _id) index (see
+# indexes.py), so a lookup reads only the matching dealers however many users
+# there are. dealers_for_district() keeps results per district for
+# KM_DEALER_CACHE_TTL seconds; register() in this process drops the affected
+# districts right away, other workers pick a new dealer up within the TTL.
+DEALER_FIELDS = {"_id": 0, "name": 1, "email": 1, "contact": 1, "role": 1, "districtPreferences": 1}
+
+_cache = {}   # district -> (expires_at, [dealer, ...])
+_lock = threading.Lock()
+
+
+def dealers_for_district(district):
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(district)
+        if hit is not None and hit[0] > now:
+            return [dict(d) for d in hit[1]]
+    dealers = list(db.users.find({"role": "dealer", "districtPreferences": district}, DEALER_FIELDS))
+    with _lock:
+        _cache[district] = (now + DEALER_CACHE_TTL, dealers)
+    return [dict(d) for d in dealers]
+
+
+def invalidate(districts=None):
+    """Forget cached dealers for `districts` (all districts if None), e.g. after a dealer registers."""
+    with _lock:
+        if districts is None:
+            _cache.clear()
+        else:
+            for d in districts:
+                _cache.pop(d, None)
+
+
+def dealer_page(districts=None, cursor=None, limit=None):
+    """
+    One page of the dealer directory in _id order.
+    districts: restrict to dealers preferring any of them (None = all dealers).
+    cursor: the last _id of the previous page (hex string).
+    Returns (dealers, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = min(max(int(limit or DEALER_PAGE_SIZE), 1), DEALER_PAGE_MAX)
+    query = _dealer_query(districts)
+    if cursor:
+        if not ObjectId.is_valid(cursor):
+            raise ValueError("invalid cursor")
+        query["_id"] = {"$gt": ObjectId(cursor)}
+
+    fields = {**DEALER_FIELDS, "_id": 1}
+    page = list(db.users.find(query, fields).sort("_id", 1).limit(limit + 1))
+    next_cursor = str(page[limit - 1]["_id"]) if len(page) > limit else None
+    page = page[:limit]
+    for d in page:
+        d["_id"] = str(d["_id"])
+    return page, next_cursor
+
+
+def dealer_list(districts=None):
+    """The whole (unpaged) dealer directory in _id order, for clients that do not page."""
+    fields = {**DEALER_FIELDS, "_id": 1}
+    dealers = list(db.users.find(_dealer_query(districts), fields).sort("_id", 1))
+    for d in dealers:
+        d["_id"] = str(d["_id"])
+    return dealers
+
+
+def _dealer_query(districts):
+    query = {"role": "dealer"}
+    if districts is not None:
+        query["districtPreferences"] = {"$in": list(districts)}
+    return query
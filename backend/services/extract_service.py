@@ -0,0 +1,50 @@
+# backend/services/extract_service.py
+import pandas as pd
+from services.mongo_client import db
+from services.keys import commodity_key
+
+# Bulk extraction of training series.
+#
+# One server-side $group over `crops` by (state, commodity_key, date) with
+# $avg(price), sorted so each pair's days arrive together. The cursor is
+# consumed as a stream and every pair's daily series is handed out as soon
+# as its last day has been read, so retraining everything costs one pass
+# over the collection no matter how many pairs there are.
+
+
+def _pipeline(pairs=None):
+    stages = []
+    if pairs:
+        stages.append({"$match": {"$or": [{"state": s, "commodity_key": commodity_key(c)} for s, c in pairs]}})
+    stages += [
+        {"$group": {"_id": {"state": "$state", "ck": "$commodity_key", "date": "$date"},
+                    "price": {"$avg": "$price"}, "commodity": {"$first": "$commodity"}}},
+        {"$sort": {"_id.state": 1, "_id.ck": 1, "_id.date": 1}},
+    ]
+    return stages
+
+
+def _daily(dates, prices):
+    # same shape as series_service.to_series: daily, gaps interpolated
+    s = pd.Series(prices, index=pd.to_datetime(dates), dtype=float).sort_index().resample("D").mean()
+    return s.interpolate(limit_direction="both").rename("price")
+
+
+def iter_training_series(pairs=None):
+    """
+    Yields (state, commodity, series) for every (state, commodity_key) in
+    `crops`, or only for `pairs` [(state, crop), ...] if given. `commodity`
+    is the display name of the first row seen for the pair.
+    """
+    cursor = db.crops.aggregate(_pipeline(pairs), allowDiskUse=True, batchSize=10000)
+    key, name, dates, prices = None, None, [], []
+    for r in cursor:
+        k = (r["_id"]["state"], r["_id"]["ck"])
+        if k != key:
+            if key is not None:
+                yield key[0], name, _daily(dates, prices)
+            key, name, dates, prices = k, r["commodity"], [], []
+        dates.append(r["_id"]["date"])
+        prices.append(r["price"])
+    if key is not None:
+        yield key[0], name, _daily(dates, prices)
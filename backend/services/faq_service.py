@@ -0,0 +1,201 @@
+# backend/services/faq_service.py
+import os, re, json, hashlib, threading, time, unicodedata
+from config import FAQ_PATH, FAQ_SOURCE, FAQ_CHECK_SECONDS
+
+# Chatbot FAQ matching over a token inverted index.
+#
+# Every FAQ has keyword phrases in English and/or Hindi. Phrases are
+# normalised and tokenised (Devanagari-aware, see _tokens), and each token
+# maps to the (faq, phrase) pairs containing it. A message is matched by
+# looking up only its own tokens, so the cost follows the message length
+# and not the number of FAQs. A phrase scores its token count when all its
+# tokens occur in the message; unknown message tokens may match a keyword
+# token one edit away (typos). Highest score wins, ties go to the FAQ listed
+# first in the source.
+#
+# Source: data/faqs.json (KM_FAQ_PATH) or, with KM_FAQ_SOURCE=mongo, the
+# `faqs` collection; same document shape:
+#   {"id", "keywords": ["phrase", ...], "en": "answer", "hi": "उत्तर"}
+# The source version is checked at most every KM_FAQ_CHECK_SECONDS and a
+# changed source is re-indexed in a background thread; until it is ready the
+# previous index keeps answering. For the file it is the mtime/size; the
+# collection has no modification stamp, so its version is a hash of the
+# FAQ documents themselves (a few KB, read once per check).
+FALLBACK = "❌ Sorry, I didn’t understand that. कृपया 'help' लिखें।"
+FUZZY_WEIGHT = 0.8
+
+# letters/digits plus the Devanagari block: \w alone splits Hindi words at
+# vowel signs (matras) and viramas, which are combining marks. The danda and
+# double danda (।, ॥ U+0964/65) are sentence punctuation and stay separators.
+_TOKEN_RE = re.compile(r"[\w\u0900-\u0963\u0966-\u097F]+")
+_NUKTA, _CHANDRABINDU, _ANUSVARA = "\u093c", "\u0901", "\u0902"
+
+
+def detect_language(text: str) -> str:
+    # If contains Hindi characters → Hindi
+    if re.search(r'[\u0900-\u097F]', text):
+        return "hi"
+    return "en"
+
+
+def _stem(tok):
+    # light English suffix folding, applied to keywords and messages alike:
+    # crops/crop, queries/query, selling/sell, registered/register, helpful/help, stopped/stop
+    if not tok.isascii():
+        return tok
+    if len(tok) > 4 and tok.endswith("ies"):
+        return tok[:-3] + "y"
+    for suffix, min_len in (("ing", 6), ("ed", 5), ("ful", 6)):
+        if len(tok) >= min_len and tok.endswith(suffix):
+            tok = tok[:-len(suffix)]
+            if len(tok) > 3 and tok[-1] == tok[-2] and tok[-1] not in "lsz":
+                tok = tok[:-1]   # doubled final consonant: stopp -> stop
+            return tok
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+        return tok[:-1]
+    return tok
+
+
+def _tokens(text):
+    text = unicodedata.normalize("NFC", text).lower()
+    # spelling variants common in typed Hindi: nukta forms (ज़/ज), chandrabindu vs anusvara
+    text = text.replace(_NUKTA, "").replace(_CHANDRABINDU, _ANUSVARA)
+    return [_stem(t) for t in _TOKEN_RE.findall(text)]
+
+
+def _deletes(tok):
+    return {tok[:i] + tok[i + 1:] for i in range(len(tok))}
+
+
+class FaqIndex:
+    def __init__(self, faqs, version=None):
+        self.faqs = faqs
+        self.version = version
+        self.phrases = []      # (faq_idx, n_tokens)
+        self.postings = {}     # token -> [phrase_idx, ...]
+        self.near = {}         # one-deletion variant -> {token}, for typo matching
+        for fi, faq in enumerate(faqs):
+            for kw in faq.get("keywords", []):
+                toks = set(_tokens(kw))
+                if not toks:
+                    continue
+                pi = len(self.phrases)
+                self.phrases.append((fi, len(toks)))
+                for t in toks:
+                    self.postings.setdefault(t, []).append(pi)
+        for t in self.postings:
+            if len(t) >= 4:
+                for d in _deletes(t):
+                    self.near.setdefault(d, set()).add(t)
+
+    def _expand(self, tok):
+        """{keyword token: weight} a message token stands for."""
+        if tok in self.postings:
+            return {tok: 1.0}
+        if len(tok) < 4:
+            return {}
+        cands = set(self.near.get(tok, ()))                  # tok is a keyword with one letter dropped
+        for d in _deletes(tok):
+            if d in self.postings:                            # tok has one extra letter
+                cands.add(d)
+            cands.update(self.near.get(d, ()))                # one substituted letter
+        return {c: FUZZY_WEIGHT for c in cands}
+
+    def match(self, message):
+        """The best-matching FAQ dict, or None."""
+        seen = {}
+        for tok in set(_tokens(message)):
+            for kw_tok, w in self._expand(tok).items():
+                seen[kw_tok] = max(seen.get(kw_tok, 0.0), w)
+
+        hits = {}   # phrase -> (matched tokens, weight sum)
+        for kw_tok, w in seen.items():
+            for pi in self.postings[kw_tok]:
+                n, s = hits.get(pi, (0, 0.0))
+                hits[pi] = (n + 1, s + w)
+
+        scores = {}
+        for pi, (n, s) in hits.items():
+            fi, size = self.phrases[pi]
+            if n == size:
+                scores[fi] = scores.get(fi, 0.0) + s
+        if not scores:
+            return None
+        best = max(scores.items(), key=lambda kv: (kv[1], -kv[0]))[0]
+        return self.faqs[best]
+
+
+# ---- source + background rebuild ----
+_index = FaqIndex([])
+_checked = 0.0
+_rebuilding = False
+_lock = threading.Lock()
+
+
+def _source_version():
+    if FAQ_SOURCE == "mongo":
+        body = json.dumps(_load_faqs(), sort_keys=True, ensure_ascii=False, default=str)
+        return ("mongo", hashlib.sha1(body.encode("utf-8")).hexdigest())
+    try:
+        st = os.stat(FAQ_PATH)
+    except OSError:
+        return None
+    return ("file", st.st_mtime_ns, st.st_size)
+
+
+def _load_faqs():
+    if FAQ_SOURCE == "mongo":
+        from services.mongo_client import db
+        return list(db.faqs.find({}, {"_id": 0}).sort([("order", 1), ("_id", 1)]))
+    with open(FAQ_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _rebuild(version):
+    global _index, _rebuilding
+    try:
+        _index = FaqIndex(_load_faqs(), version)
+        print(f"💬 FAQ index built: {len(_index.faqs)} FAQs, {len(_index.postings)} tokens")
+    except Exception as e:
+        print(f"⚠ FAQ index rebuild failed, keeping the previous one: {e}")
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def get_index():
+    """Current FaqIndex; schedules a background rebuild when the source changed."""
+    global _checked, _rebuilding
+    now = time.monotonic()
+    if now - _checked < FAQ_CHECK_SECONDS:
+        return _index
+    with _lock:
+        if now - _checked < FAQ_CHECK_SECONDS or _rebuilding:
+            return _index
+        _checked = now
+    try:
+        version = _source_version()
+    except Exception as e:
+        print(f"⚠ FAQ source check failed: {e}")
+        return _index
+    if version is None or version == _index.version:
+        return _index
+    first = not _index.faqs
+    with _lock:
+        if _rebuilding:
+            return _index
+        _rebuilding = True
+    if first:
+        _rebuild(version)   # nothing to answer with yet
+    else:
+        threading.Thread(target=_rebuild, args=(version,), daemon=True, name="faq-index").start()
+    return _index
+
+
+def find_answer(user_message: str) -> str:
+    faq = get_index().match(user_message)
+    if faq is None:
+        # fallback if not found
+        return FALLBACK
+    lang = detect_language(user_message)
+    return faq.get(lang) or faq["en"]
@@ -0,0 +1,140 @@
+# backend/services/forecast_cache.py
+import threading, time, datetime
+from collections import OrderedDict
+from services.mongo_client import db
+from services.keys import commodity_key
+from config import FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL, FORECAST_CACHE_MONGO
+
+# Read-through cache of predict_state_crop results.
+#
+# A forecast is fully determined by (series revision, hist_end, model version,
+# start date), so those make up the key. The revision comes from the `series`
+# record and is bumped by every refresh, so rows added by an ingest in any
+# process (which may not move hist_end) change the key, as does a retrain via
+# the model version; stale entries are simply never looked up again.
+#
+# Layer 1 is a per-process LRU with TTL. Layer 2 (KM_FORECAST_CACHE_MONGO=1) is the
+# `forecast_cache` collection shared by all workers. The invalidate_* calls only
+# reclaim space early (layer 1 of the calling process, and layer 2); other
+# workers' unreachable layer-1 copies fall out of the LRU or age out after the TTL.
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "mongo_hits": 0, "misses": 0, "invalidated": 0,
+          "hit_seconds": 0.0, "miss_seconds": 0.0}
+_mongo_ready = False
+
+
+def make_key(state, district, crop, rev, hist_end, model_version, start_date):
+    version = ":".join(str(v) for v in model_version)
+    return (f"{state}|{district or ''}|{commodity_key(crop)}|r{rev}|{hist_end.isoformat()}"
+            f"|{version}|{start_date.isoformat()}")
+
+
+def _collection():
+    global _mongo_ready
+    coll = db.forecast_cache
+    if not _mongo_ready:
+        coll.create_index("created_at", expireAfterSeconds=FORECAST_CACHE_TTL)
+        coll.create_index([("state", 1), ("crop", 1)])
+        _mongo_ready = True
+    return coll
+
+
+def get(key):
+    now = time.time()
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            if now - entry["created"] <= FORECAST_CACHE_TTL:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                return entry["value"]
+            del _cache[key]
+
+    if FORECAST_CACHE_MONGO:
+        doc = _collection().find_one({"_id": key}, {"value": 1, "state": 1, "crop": 1, "source": 1})
+        if doc is not None:
+            _store_local(key, doc["value"], doc["state"], doc["crop"], doc.get("source"))
+            with _lock:
+                _stats["mongo_hits"] += 1
+            return doc["value"]
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def put(key, value, state, crop, source):
+    """
+    source: the district whose rows produced the forecast, or None if the
+    state-pooled series was used (invalidated by any district of the state).
+    """
+    _store_local(key, value, state, commodity_key(crop), source)
+    if FORECAST_CACHE_MONGO:
+        _collection().replace_one(
+            {"_id": key},
+            {"value": value, "state": state, "crop": commodity_key(crop), "source": source,
+             "created_at": datetime.datetime.utcnow()},
+            upsert=True,
+        )
+
+
+def _store_local(key, value, state, crop, source):
+    with _lock:
+        _cache[key] = {"value": value, "state": state, "crop": crop, "source": source, "created": time.time()}
+        _cache.move_to_end(key)
+        while len(_cache) > FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def invalidate_series(state, crop, districts=None):
+    """
+    Drop forecasts built from (state, crop) history. With `districts`, only
+    entries for those districts plus state-pooled entries are dropped.
+    """
+    crop = commodity_key(crop)
+
+    def stale(e):
+        if e["state"] != state or e["crop"] != crop:
+            return False
+        return districts is None or e["source"] is None or e["source"] in districts
+
+    with _lock:
+        keys = [k for k, e in _cache.items() if stale(e)]
+        for k in keys:
+            del _cache[k]
+        _stats["invalidated"] += len(keys)
+
+    if FORECAST_CACHE_MONGO:
+        query = {"state": state, "crop": crop}
+        if districts is not None:
+            query["source"] = {"$in": [None, *districts]}
+        _collection().delete_many(query)
+
+
+def invalidate_model(state, crop):
+    invalidate_series(state, crop)
+
+
+def record_latency(hit, seconds):
+    with _lock:
+        _stats["hit_seconds" if hit else "miss_seconds"] += seconds
+
+
+def cache_stats():
+    with _lock:
+        hits = _stats["hits"] + _stats["mongo_hits"]
+        lookups = hits + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "mongo_hits": _stats["mongo_hits"],
+            "misses": _stats["misses"],
+            "invalidated": _stats["invalidated"],
+            "size": len(_cache),
+            "capacity": FORECAST_CACHE_SIZE,
+            "ttl_seconds": FORECAST_CACHE_TTL,
+            "shared": FORECAST_CACHE_MONGO,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_ms": round(1000 * _stats["hit_seconds"] / hits, 3) if hits else None,
+            "avg_miss_ms": round(1000 * _stats["miss_seconds"] / _stats["misses"], 3) if _stats["misses"] else None,
+        }
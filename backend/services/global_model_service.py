@@ -0,0 +1,170 @@
+# backend/services/global_model_service.py
+import os, json, threading, datetime
+import numpy as np
+import pandas as pd
+from services.keys import commodity_key
+from config import MODELS_DIR, SEQ_LEN, PRED_HORIZON, EPOCHS, BATCH_SIZE, GLOBAL_EMBED_DIM
+
+# Optional single model for every (state, crop) series (KM_FORECAST_MODE=global).
+#
+# Same LSTM(128) -> Dense(horizon) core as the per-pair models, plus learned
+# state and crop embeddings concatenated to the LSTM output. Each series is
+# standardised with its own mean/std, kept in global__meta.json next to the
+# model, so one set of weights serves all pairs and rows for different crops
+# can share a forward pass.
+def model_paths(out_dir=MODELS_DIR):
+    """(model .h5, meta .json) paths of the global model in out_dir."""
+    return os.path.join(out_dir, "global__model.h5"), os.path.join(out_dir, "global__meta.json")
+
+
+MODEL_PATH, META_PATH = model_paths()
+
+_loaded = {"version": None, "model": None, "meta": None}
+_lock = threading.Lock()
+
+
+class SeriesScaler:
+    """Per-series standardisation with the StandardScaler transform/inverse_transform interface."""
+
+    def __init__(self, mean, std):
+        self.mean, self.std = float(mean), float(std) or 1.0
+
+    def transform(self, arr):
+        return (np.asarray(arr, dtype=float) - self.mean) / self.std
+
+    def inverse_transform(self, arr):
+        return np.asarray(arr, dtype=float) * self.std + self.mean
+
+
+def build_global_model(n_states, n_crops, seq_len=SEQ_LEN, horizon=PRED_HORIZON, embed_dim=GLOBAL_EMBED_DIM):
+    from tensorflow.keras import layers, Model
+
+    seq_in = layers.Input(shape=(seq_len, 1), name="seq")
+    state_in = layers.Input(shape=(1,), dtype="int32", name="state_id")
+    crop_in = layers.Input(shape=(1,), dtype="int32", name="crop_id")
+
+    h = layers.LSTM(128)(seq_in)
+    s = layers.Flatten()(layers.Embedding(n_states, embed_dim, name="state_emb")(state_in))
+    c = layers.Flatten()(layers.Embedding(n_crops, embed_dim, name="crop_emb")(crop_in))
+    x = layers.Concatenate()([h, s, c])
+    x = layers.Dropout(0.2)(x)
+    out = layers.Dense(horizon)(x)
+
+    model = Model([seq_in, state_in, crop_in], out)
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+
+def train_global_model(series_by_pair, on_epoch=None, out_dir=MODELS_DIR):
+    """
+    series_by_pair: {(state, commodity_key): pd.Series} of dense daily state-pooled series.
+    Trains one model over all of them and writes model_paths(out_dir)
+    (MODEL_PATH / META_PATH, the served model, by default).
+    """
+    from tensorflow.keras.callbacks import EarlyStopping, LambdaCallback
+    from services.preprocess_service import create_sequences
+
+    usable = {k: s for k, s in series_by_pair.items() if s is not None and len(s) >= SEQ_LEN + PRED_HORIZON + 10}
+    if not usable:
+        return None
+    states = sorted({st for st, _ in usable})
+    crops = sorted({c for _, c in usable})
+    s_idx = {st: i for i, st in enumerate(states)}
+    c_idx = {c: i for i, c in enumerate(crops)}
+
+    X, y, sid, cid, scalers = [], [], [], [], {}
+    for (st, crop), series in usable.items():
+        arr = series.values.astype(float)
+        scaler = SeriesScaler(arr.mean(), arr.std())
+        scalers[f"{st}__{crop}"] = [scaler.mean, scaler.std]
+        Xi, yi = create_sequences(pd.Series(scaler.transform(arr)), seq_len=SEQ_LEN, horizon=PRED_HORIZON)
+        X.append(Xi); y.append(yi)
+        sid.append(np.full(len(Xi), s_idx[st], dtype=np.int32))
+        cid.append(np.full(len(Xi), c_idx[crop], dtype=np.int32))
+    X, y = np.concatenate(X).astype(np.float32), np.concatenate(y).astype(np.float32)
+    sid, cid = np.concatenate(sid)[:, None], np.concatenate(cid)[:, None]
+
+    model = build_global_model(len(states), len(crops))
+    cb = [EarlyStopping(monitor="loss", patience=4, restore_best_weights=True)]
+    if on_epoch:
+        cb.append(LambdaCallback(on_epoch_end=lambda epoch, logs: on_epoch(epoch + 1, EPOCHS, logs or {})))
+    hist = model.fit([X, sid, cid], y, epochs=EPOCHS, batch_size=BATCH_SIZE * 4, shuffle=True, callbacks=cb, verbose=1)
+
+    model_path, meta_path = model_paths(out_dir)
+    tmp_model, tmp_meta = model_path + ".tmp.h5", meta_path + ".tmp"
+    model.save(tmp_model)
+    meta = {"states": states, "crops": crops, "scalers": scalers, "seq_len": SEQ_LEN, "horizon": PRED_HORIZON,
+            "series": len(usable), "samples": int(len(X)), "loss": float(min(hist.history["loss"])),
+            "trained_at": datetime.datetime.utcnow().isoformat() + "Z"}
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_model, model_path)
+    os.replace(tmp_meta, meta_path)
+    return {k: meta[k] for k in ("series", "samples", "loss", "trained_at")}
+
+
+def global_version():
+    try:
+        m, j = os.stat(MODEL_PATH), os.stat(META_PATH)
+    except OSError:
+        return None
+    return (m.st_mtime_ns, m.st_size, j.st_mtime_ns, j.st_size)
+
+
+def _load():
+    version = global_version()
+    if version is None:
+        return None, None
+    with _lock:
+        if _loaded["version"] != version:
+            from tensorflow.keras.models import load_model
+            with open(META_PATH) as f:
+                meta = json.load(f)
+            _loaded.update(version=version, model=load_model(MODEL_PATH, compile=False), meta=meta)
+        return _loaded["model"], _loaded["meta"]
+
+
+def _ids(meta, state, crop):
+    try:
+        return meta["states"].index(state), meta["crops"].index(commodity_key(crop))
+    except ValueError:
+        return None
+
+
+def get_scaler(state, crop):
+    model, meta = _load()
+    key = f"{state}__{commodity_key(crop)}"
+    if model is None or key not in meta["scalers"]:
+        return None
+    return SeriesScaler(*meta["scalers"][key])
+
+
+def predict_fn_for(pairs):
+    """
+    predict_fn over stacked rows, row i belonging to pairs[i] = (state, crop).
+    Returns None if the global model is missing or does not know a pair.
+    """
+    model, meta = _load()
+    return predict_fn_from(model, meta, pairs)
+
+
+def predict_fn_from(model, meta, pairs):
+    """predict_fn_for over an already loaded (model, meta), e.g. one trained outside MODELS_DIR."""
+    if model is None:
+        return None
+    ids = [_ids(meta, st, c) for st, c in pairs]
+    if any(i is None for i in ids):
+        return None
+    sid = np.array([i[0] for i in ids], dtype=np.int32)[:, None]
+    cid = np.array([i[1] for i in ids], dtype=np.int32)[:, None]
+
+    def predict(X):
+        return np.asarray(model([X, sid, cid], training=False))
+    return predict
+
+
+def load_training_series():
+    """{(state, commodity_key): series} for every materialised state-pooled series."""
+    from services.mongo_client import db
+    from services.series_service import to_series
+    return {(rec["state"], rec["crop"]): to_series(rec) for rec in db.series.find({"district": None})}
@@ -0,0 +1,61 @@
+# backend/services/http_cache.py
+import gzip, json, hashlib
+from flask import request, Response
+from config import GZIP_MIN_BYTES
+
+# Response layer for read-mostly endpoints.
+#
+# - ETag derived from the data version behind the body (catalog version,
+#   forecast inputs + model version); a matching If-None-Match gets a 304
+#   with no body.
+# - gzip for bodies over KM_GZIP_MIN_BYTES when the client accepts it.
+# - orjson for serialisation when installed, compact stdlib json otherwise.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def make_etag(*parts):
+    """ETag value from the version components of a response (sent weak: gzip and identity share it)."""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+
+
+def not_modified(etag):
+    """True if the request's If-None-Match already names this ETag."""
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+
+def _cache_headers(resp, etag, max_age, last_modified):
+    if etag is not None:
+        resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = f"public, max-age={max_age}" if max_age else "no-cache"
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def json_response(payload, status=200, etag=None, max_age=0, last_modified=None):
+    """
+    JSON Response with caching headers. max_age=0 means clients must
+    revalidate (cheap with the ETag) before reusing a stored copy.
+    """
+    if status == 200 and not_modified(etag):
+        return _cache_headers(Response(status=304), etag, max_age, last_modified)
+
+    body = dumps(payload)
+    resp = Response(body, status=status, mimetype="application/json")
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        resp.set_data(gzip.compress(body, compresslevel=6))
+        resp.headers["Content-Encoding"] = "gzip"
+    if status != 200:
+        resp.vary.add("Accept-Encoding")
+        return resp
+    return _cache_headers(resp, etag, max_age, last_modified)
@@ -0,0 +1,120 @@
+# backend/services/indexes.py
+from pymongo import ASCENDING, UpdateMany
+from pymongo.errors import OperationFailure
+from services.mongo_client import db
+from services.keys import commodity_key
+
+# Index set the app relies on, built at startup by ensure_indexes().
+# (collection, keys, options)
+INDEXES = [
+    # natural key (one price per state/district/commodity/date), also serves
+    # history lookups on state + commodity_key (+ district) in date order
+    ("crops", [("state", ASCENDING), ("commodity_key", ASCENDING), ("district", ASCENDING), ("date", ASCENDING)],
+     {"unique": True}),
+    ("series", [("state", ASCENDING), ("crop", ASCENDING), ("district", ASCENDING)], {"unique": True}),
+    ("top_crops", [("state", ASCENDING), ("district", ASCENDING)], {}),
+    ("crop_counts", [("state", ASCENDING), ("district", ASCENDING), ("commodity_key", ASCENDING)], {"unique": True}),
+    ("models_meta", [("state", ASCENDING), ("crop", ASCENDING)], {}),
+    ("ingest_watermarks", [("kind", ASCENDING)], {}),
+    # dealers by district (multikey on districtPreferences), paged in _id order
+    ("users", [("role", ASCENDING), ("districtPreferences", ASCENDING), ("_id", ASCENDING)], {}),
+    ("users", [("email", ASCENDING)], {}),
+]
+
+# Indexes no query uses any more; ensure_indexes(replace_conflicting=True) drops them.
+# The catalog is built from crop_counts, not distinct() over crops.
+OBSOLETE_INDEXES = [
+    ("crops", [("state", ASCENDING), ("district", ASCENDING), ("commodity", ASCENDING)]),
+]
+
+
+def ensure_indexes(replace_conflicting=False):
+    """
+    Create any missing index from INDEXES (no-op for ones that already exist).
+    An existing index on the same keys with different options (e.g. the old
+    non-unique crops index) is only dropped and rebuilt with replace_conflicting,
+    which also drops OBSOLETE_INDEXES.
+    """
+    for coll, keys, opts in INDEXES:
+        try:
+            db[coll].create_index(keys, **opts)
+        except OperationFailure as e:
+            if not replace_conflicting:
+                print(f"⚠ Index {coll} {keys} not created ({e}); run migrate.py")
+                continue
+            for name, info in db[coll].index_information().items():
+                if list(info["key"]) == keys:
+                    db[coll].drop_index(name)
+            db[coll].create_index(keys, **opts)
+    if replace_conflicting:
+        for coll, keys in OBSOLETE_INDEXES:
+            for name, info in db[coll].index_information().items():
+                if list(info["key"]) == keys:
+                    db[coll].drop_index(name)
+
+
+def dedupe_crops():
+    """
+    Collapse crops docs sharing (state, district, commodity_key, date) into one
+    doc with their mean price, so the unique natural-key index can be built.
+    Returns the number of docs removed.
+    """
+    removed = 0
+    dupes = db.crops.aggregate([
+        {"$group": {"_id": {"state": "$state", "district": "$district", "ck": "$commodity_key", "date": "$date"},
+                    "ids": {"$push": "$_id"}, "price": {"$avg": "$price"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for d in dupes:
+        keep, drop = d["ids"][0], d["ids"][1:]
+        db.crops.update_one({"_id": keep}, {"$set": {"price": d["price"]}})
+        removed += db.crops.delete_many({"_id": {"$in": drop}}).deleted_count
+    return removed
+
+
+def migrate_commodity_keys(batch_filter=None):
+    """
+    Backfill `commodity_key` on crops docs written before it existed, and
+    repair keys that differ from keys.commodity_key (e.g. internal whitespace
+    left uncollapsed by an older server-side backfill).
+    The key is computed in Python, so it matches what predict/train/ingest
+    look up; there are few distinct names, so this is one UpdateMany per name.
+    Returns the number of docs updated.
+    """
+    query = dict(batch_filter or {})
+    ops = [
+        UpdateMany({**query, "commodity": name, "commodity_key": {"$ne": commodity_key(name)}},
+                   {"$set": {"commodity_key": commodity_key(name)}})
+        for name in db.crops.distinct("commodity", query)
+    ]
+    modified = 0
+    for i in range(0, len(ops), 500):
+        modified += db.crops.bulk_write(ops[i:i + 500], ordered=False).modified_count
+    return modified
+
+
+def _winning_stages(plan):
+    stages, node = [], plan
+    while node:
+        stages.append(node.get("stage"))
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return stages
+
+
+def explain_hot_queries(state, district, crop):
+    """
+    Explain the hot read queries for one (state, district, crop) and report
+    the winning plan stages; every entry should show IXSCAN, never COLLSCAN.
+    """
+    ck = commodity_key(crop)
+    checks = {
+        "history_district": {"state": state, "commodity_key": ck, "district": district},
+        "history_state": {"state": state, "commodity_key": ck},
+    }
+    report = {}
+    for name, query in checks.items():
+        plan = db.crops.find(query, {"date": 1, "price": 1}).explain()
+        stages = _winning_stages(plan["queryPlanner"]["winningPlan"])
+        report[name] = {"stages": stages, "indexed": "IXSCAN" in stages,
+                        "collscan": "COLLSCAN" in stages}
+    return report
@@ -0,0 +1,115 @@
+# backend/services/inference_batcher.py
+import threading, time
+import numpy as np
+from services.rollout_service import rollout
+from config import MICROBATCH_WAIT_MS, MICROBATCH_MAX
+
+# Micro-batching of concurrent rollouts on the same model.
+#
+# The districts of one (state, crop) share a model, so at peak many request
+# threads roll out through the same weights, each pushing a (1, SEQ_LEN, 1)
+# window per step. batched_rollout() queues every step per model: the first
+# caller to queue becomes the leader, waits up to KM_MICROBATCH_WAIT_MS for the
+# other rollouts in progress on that model to queue their windows (or until
+# KM_MICROBATCH_MAX rows are pending), runs one stacked forward pass and hands
+# each caller its own rows. A rollout that is alone on its model never waits.
+_queues = {}              # model key -> _ModelQueue, while rollouts are in progress on it
+_lock = threading.Lock()
+_stats = {"passes": 0, "rows": 0, "merged_passes": 0, "max_rows": 0}
+_stats_lock = threading.Lock()
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = []   # slots waiting for a forward pass
+        self.rows = 0
+        self.active = 0     # rollouts in progress on this model
+        self.leader = False
+
+    def predict(self, predict_fn, X):
+        slot = {"X": X, "out": None, "error": None, "done": False}
+        with self.cond:
+            self.pending.append(slot)
+            self.rows += len(X)
+            if self.leader:
+                # a leader is collecting: it takes this slot along
+                self.cond.notify_all()
+                while not slot["done"]:
+                    self.cond.wait()
+                return _result(slot)
+            self.leader = True
+            deadline = time.monotonic() + MICROBATCH_WAIT_MS / 1000.0
+            while self.rows < MICROBATCH_MAX and len(self.pending) < self.active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch, self.pending, self.rows = self.pending, [], 0
+            self.leader = False
+
+        # forward pass outside the lock: the next batch can gather meanwhile
+        out, error = None, None
+        try:
+            X_all = batch[0]["X"] if len(batch) == 1 else np.concatenate([s["X"] for s in batch])
+            out = np.asarray(predict_fn(X_all), dtype=np.float32)
+        except Exception as e:
+            error = e
+        with self.cond:
+            start = 0
+            for s in batch:
+                n = len(s["X"])
+                s["out"] = out[start:start + n] if error is None else None
+                s["error"], s["done"] = error, True
+                start += n
+            self.cond.notify_all()
+        with _stats_lock:
+            _stats["passes"] += 1
+            _stats["rows"] += start
+            _stats["merged_passes"] += len(batch) > 1
+            _stats["max_rows"] = max(_stats["max_rows"], start)
+        return _result(slot)
+
+
+def _result(slot):
+    if slot["error"] is not None:
+        raise slot["error"]
+    return slot["out"]
+
+
+def batched_rollout(key, predict_fn, seeds, steps):
+    """
+    rollout(predict_fn, seeds, steps) whose forward passes are shared with the
+    other rollouts in progress on the same model `key` (e.g. (state, crop, version)).
+    """
+    if MICROBATCH_WAIT_MS <= 0:
+        return rollout(predict_fn, seeds, steps)
+    with _lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = _ModelQueue()
+        with queue.cond:
+            queue.active += 1
+    try:
+        return rollout(lambda X: queue.predict(predict_fn, X), seeds, steps)
+    finally:
+        with _lock:
+            with queue.cond:
+                queue.active -= 1
+                queue.cond.notify_all()   # a waiting leader may now have everyone queued
+                if queue.active == 0:
+                    _queues.pop(key, None)
+
+
+def batcher_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    with _lock:
+        active = sum(q.active for q in _queues.values())
+    return {
+        **stats,
+        "avg_rows": round(stats["rows"] / stats["passes"], 2) if stats["passes"] else 0.0,
+        "active_rollouts": active,
+        "wait_ms": MICROBATCH_WAIT_MS,
+        "max_batch": MICROBATCH_MAX,
+    }
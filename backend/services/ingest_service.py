@@ -1,10 +1,17 @@
 # backend/services/ingest_service.py
-import os, json
+import os, json, time, uuid
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timedelta
 from pathlib import Path
-from config import DATA_DIR, DATA_YEARS
+from config import DATA_DIR, DATA_YEARS, TOPCROPS_JSON, TOP_CROPS_N, INGEST_CHUNK, INGEST_BATCH, INGEST_WRITERS
 from services.mongo_client import db
+from services import forecast_cache, catalog_service
+from services.series_service import refresh_series
+from services.keys import commodity_keys
 
 Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
 
@@ -13,100 +20,359 @@ def date_range_years(years):
     start = end - timedelta(days=365 * years)
     return start, end
 
-def clean_and_insert(csv_path):
-    print(f"📂 Loading CSV: {csv_path}")
-    
-    # Read CSV
-    df = pd.read_csv(csv_path)
-
+def _clean_chunk(df, start, end):
+    """Vectorised clean / type conversion of one raw CSV chunk."""
     # Strip spaces from headers just in case
     df.columns = df.columns.str.strip()
-    print("📑 CSV Columns detected:", df.columns.tolist())
 
     # Rename columns to match internal usage
     df = df.rename(columns={
-    'State': 'State',              # already matches
-    'District': 'District',
-    'Crop': 'Commodity',
-    'Price': 'Modal Price',        # ✅ use "Price" instead of "Model Price(in Quintal)"
-    'Date': 'Date'
+        'Crop': 'Commodity',
+        'Price': 'Modal Price',        # ✅ use "Price" instead of "Model Price(in Quintal)"
     })
 
-    # Convert Date from string to datetime
+    # Keep only relevant columns (drop Sl no)
+    df = df[['Date', 'State', 'District', 'Commodity', 'Modal Price']].copy()
+
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Modal Price'] = pd.to_numeric(df['Modal Price'], errors='coerce')
+    df = df.dropna(subset=['Date', 'State', 'District', 'Commodity', 'Modal Price'])
+    for col in ('State', 'District', 'Commodity'):
+        df[col] = df[col].astype(str).str.strip()
 
-    # Keep only relevant columns (drop Sl no)
-    df = df[['Date', 'State', 'District', 'Commodity', 'Modal Price']]
+    # Filter by years
+    return df[(df['Date'] >= start) & (df['Date'] < end)]
 
-    print("Initial rows:", len(df))
 
-    # Drop rows with missing required fields
-    df = df.dropna(subset=['Date', 'State', 'District', 'Commodity', 'Modal Price'])
-    print("After dropna:", len(df))
+def _chunk_ops(df, run_id):
+    """
+    Upserts on the natural key (state, district, commodity_key, date) for a
+    cleaned chunk grouped to per-key price sums/counts.
 
-    # Convert prices to numeric
-    df['Modal Price'] = pd.to_numeric(df['Modal Price'], errors='coerce')
-    df = df.dropna(subset=['Modal Price'])
-    print("After numeric conversion:", len(df))
+    Within one ingest run (run_id) the sums and counts of every chunk are
+    added up, so duplicates split across chunks still average to their mean;
+    the first write of a later run replaces them, so a re-ingest overwrites
+    rather than double-counts.
+    """
+    ops = []
+    for r in df.to_dict('records'):
+        same_run = {"$eq": ["$ingest_run", run_id]}
+        ops.append(UpdateOne(
+            {"state": r["State"], "district": r["District"], "commodity_key": r["ck"], "date": r["Day"]},
+            [{"$set": {
+                "commodity": r["Commodity"],
+                "price_sum": {"$cond": [same_run, {"$add": ["$price_sum", r["price_sum"]]}, r["price_sum"]]},
+                "price_count": {"$cond": [same_run, {"$add": ["$price_count", r["price_count"]]}, r["price_count"]]},
+            }},
+             {"$set": {"ingest_run": run_id, "price": {"$divide": ["$price_sum", "$price_count"]}}}],
+            upsert=True,
+        ))
+    return ops
+
+
+class _BulkWriter:
+    """
+    Small pool of threads doing unordered bulk_write. At most
+    2 * INGEST_WRITERS batches are in flight, so memory stays bounded.
+
+    crop_counts is bumped as each batch completes, from the upserts that batch
+    actually made (also when it failed part-way), so a failed run leaves the
+    counts matching the crops docs that were written.
+    """
+
+    def __init__(self, coll):
+        self.coll = coll
+        self.pool = ThreadPoolExecutor(max_workers=INGEST_WRITERS, thread_name_prefix="ingest-writer")
+        self.pending = deque()
+        self.inserted = self.updated = self.unchanged = 0
+        self.new_counts = {}  # (state, district, commodity_key) -> newly inserted docs
+
+    def submit(self, ops, keys):
+        """keys[i] is the (state, district, commodity_key, commodity) of ops[i]."""
+        for i in range(0, len(ops), INGEST_BATCH):
+            while len(self.pending) >= 2 * INGEST_WRITERS:
+                self._wait_oldest()
+            fut = self.pool.submit(self.coll.bulk_write, ops[i:i + INGEST_BATCH], ordered=False)
+            self.pending.append((fut, keys[i:i + INGEST_BATCH]))
+
+    def _wait_oldest(self):
+        fut, keys = self.pending.popleft()
+        try:
+            res = fut.result()
+        except BulkWriteError as e:
+            self._count_new(keys, [u["index"] for u in e.details.get("upserted", [])])
+            raise
+        self._count_new(keys, list(res.upserted_ids))
+        self.updated += res.modified_count
+        self.unchanged += res.matched_count - res.modified_count
+
+    def _count_new(self, keys, upserted):
+        batch = {}
+        for idx in upserted:
+            batch[keys[idx]] = batch.get(keys[idx], 0) + 1
+        _apply_crop_counts(batch)
+        for k, n in batch.items():
+            self.new_counts[k] = self.new_counts.get(k, 0) + n
+        self.inserted += len(upserted)
+
+    def close(self):
+        """Wait for every batch still in flight, then raise the first failure (if any)."""
+        error = None
+        try:
+            while self.pending:
+                try:
+                    self._wait_oldest()
+                except Exception as e:
+                    error = error or e
+        finally:
+            self.pool.shutdown(wait=True)
+        if error is not None:
+            raise error
+
+
+def _file_fingerprint(csv_path):
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _series_watermarks():
+    """{'state|district|commodity_key': last ingested date} for every series."""
+    return {f"{w['state']}|{w['district']}|{w['crop']}": w["max_date"]
+            for w in db.ingest_watermarks.find({"kind": "series"}, {"state": 1, "district": 1, "crop": 1, "max_date": 1})}
+
+
+def _save_series_watermarks(new_marks):
+    ops = []
+    for sid, day in new_marks.items():
+        st, dist, crop = sid.split("|", 2)
+        ops.append(UpdateOne({"_id": f"series:{sid}"},
+                             {"$set": {"kind": "series", "state": st, "district": dist, "crop": crop},
+                              "$max": {"max_date": day}},
+                             upsert=True))
+    for i in range(0, len(ops), INGEST_BATCH):
+        db.ingest_watermarks.bulk_write(ops[i:i + INGEST_BATCH], ordered=False)
+
+
+def clean_and_insert(csv_path, force=False):
+    """
+    Streaming, idempotent ingest: read the CSV in chunks of INGEST_CHUNK rows,
+    clean each chunk with vectorised pandas ops, and upsert on the natural key
+    through a writer pool. Peak memory is bounded by the chunk size.
+
+    - Rows repeating (state, district, commodity, date) inside the file are
+      collapsed to their mean price, also when they fall in different chunks
+      (per-run price_sum/price_count on the doc, see _chunk_ops).
+    - A file whose size/mtime matches its watermark from a completed run is
+      skipped (unless force=True).
+    - Rows older than their series watermark (last date already stored for that
+      state/district/commodity) are skipped; rows on or after it are upserted.
+      force=True upserts every row, e.g. to pick up corrected historical prices.
+
+    Returns inserted / updated / unchanged / skipped counts.
+    """
+    print(f"📂 Streaming CSV: {csv_path}")
+    t0 = time.perf_counter()
+    file_id = f"file:{Path(csv_path).resolve()}"
+    fingerprint = _file_fingerprint(csv_path)
+
+    run_id = uuid.uuid4().hex
+    stats = {"rows_read": 0, "inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0,
+             "file_skipped": False, "touched_districts": []}
+    done = db.ingest_watermarks.find_one({"_id": file_id})
+    if not force and done and all(done.get(k) == v for k, v in fingerprint.items()):
+        print("⏭ File unchanged since last completed ingest, skipping.")
+        stats["file_skipped"] = True
+        return stats
 
-    # Filter by years
     start, end = date_range_years(DATA_YEARS)
-    df = df[(df['Date'].dt.date >= start) & (df['Date'].dt.date <= end)]
-    print("After date filtering:", len(df))
-
-    if df.empty:
-        print("⚠ No data after cleaning. Please check your CSV.")
-        return
-
-    # Insert into MongoDB
-    docs = []
-    for _, row in df.iterrows():
-        docs.append({
-            "state": str(row['State']).strip(),
-            "district": str(row['District']).strip(),
-            "commodity": str(row['Commodity']).strip(),
-            "date": row['Date'].date().isoformat(),
-            "price": float(row['Modal Price'])
-        })
-        if len(docs) >= 2000:
-            db.crops.insert_many(docs)
-            docs = []
-    if docs:
-        db.crops.insert_many(docs)
-
-    print(f"✅ Inserted {len(df)} records into MongoDB collection 'crops'.")
+    start, end = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+
+    marks = {} if force else _series_watermarks()
+    new_marks = {}  # series id -> max date written this run
+    windows = {}    # (state, commodity) -> [min_day, max_day]
+    districts = {}  # (state, commodity) -> {district}
+    rows_written = 0
+
+    writer = _BulkWriter(db.crops)
+    try:
+        for raw in pd.read_csv(csv_path, chunksize=INGEST_CHUNK):
+            stats["rows_read"] += len(raw)
+            df = _clean_chunk(raw, start, end)
+            if df.empty:
+                continue
+
+            df = df.assign(ck=commodity_keys(df['Commodity']), Day=df['Date'].dt.strftime('%Y-%m-%d'))
+            df = (df.groupby(['State', 'District', 'ck', 'Day'], sort=False)
+                    .agg(Commodity=('Commodity', 'first'),
+                         price_sum=('Modal Price', 'sum'), price_count=('Modal Price', 'count'))
+                    .reset_index())
+
+            # Per-series watermark: only rows on/after the last stored date
+            sid = df['State'] + "|" + df['District'] + "|" + df['ck']
+            mark = sid.map(marks)
+            keep = mark.isna() | (df['Day'] >= mark.fillna(""))
+            stats["skipped"] += int((~keep).sum())
+            df, sid = df[keep], sid[keep]
+            if df.empty:
+                continue
+            rows_written += len(df)
+            writer.submit(_chunk_ops(df, run_id), list(zip(df['State'], df['District'], df['ck'], df['Commodity'])))
+
+            # Track what this chunk touched (small per-series summaries only)
+            for k, day in df.groupby(sid)['Day'].max().items():
+                new_marks[k] = max(day, new_marks.get(k, day))
+            summary = df.groupby(['State', 'Commodity']).agg(
+                lo=('Day', 'min'), hi=('Day', 'max'), districts=('District', 'unique'))
+            for key, r in summary.iterrows():
+                w = windows.setdefault(key, [r['lo'], r['hi']])
+                w[0], w[1] = min(w[0], r['lo']), max(w[1], r['hi'])
+                districts.setdefault(key, set()).update(r['districts'])
+
+            elapsed = time.perf_counter() - t0
+            print(f"   … {stats['rows_read']} rows read, {rows_written} written ({stats['rows_read'] / elapsed:,.0f} rows/s)")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    stats.update({
+        "inserted": writer.inserted,
+        "updated": writer.updated,
+        "unchanged": writer.unchanged,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(stats["rows_read"] / elapsed, 1) if elapsed else None,
+    })
+    _save_series_watermarks(new_marks)
+    stats["touched_districts"] = sorted({(st, dist) for st, dist, _, _ in writer.new_counts})
+    db.ingest_watermarks.update_one(
+        {"_id": file_id},
+        {"$set": {"kind": "file", **fingerprint, "rows_read": stats["rows_read"], "completed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+    if not rows_written:
+        print("⚠ No new data after cleaning. Please check your CSV.")
+        return stats
+    print(f"✅ crops: {stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+          f"{stats['skipped']} skipped ({stats['rows_per_second']:,} rows/s).")
+
+    # Patch the materialised daily series over the dates this file touched
+    refresh_series({k: tuple(w) for k, w in windows.items()})
+    print(f"📈 Refreshed {len(windows)} materialised series.")
+
+    # Cached forecasts built from these series are now stale
+    for (st, crop), dists in districts.items():
+        forecast_cache.invalidate_series(st, crop, list(dists))
+    return stats
+
+
+def _apply_crop_counts(new_counts):
+    """$inc the per-(state, district, commodity) doc counts behind the top-crops ranking."""
+    ops = [
+        UpdateOne({"state": st, "district": dist, "commodity_key": ck},
+                  {"$inc": {"count": n}, "$setOnInsert": {"commodity": name}},
+                  upsert=True)
+        for (st, dist, ck, name), n in new_counts.items()
+    ]
+    for i in range(0, len(ops), INGEST_BATCH):
+        db.crop_counts.bulk_write(ops[i:i + INGEST_BATCH], ordered=False)
+
+
+def _rank(counts):
+    # counts: [{"commodity", "count"}]
+    items = sorted(counts, key=lambda x: -int(x['count']))
+    return [it['commodity'] for it in items[:TOP_CROPS_N]]
+
+
+def _write_top_crops_json(update=None, replace=None):
+    """Merge `update` into (or replace with `replace`) top_crops_by_district.json atomically."""
+    path = Path(TOPCROPS_JSON)
+    if replace is not None:
+        top_obj = replace
+    else:
+        top_obj = json.loads(path.read_text()) if path.exists() else {}
+        top_obj.update(update)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(top_obj, indent=2))
+    os.replace(tmp, path)
+
+
+def refresh_top_crops(districts):
+    """
+    Recompute the top crops of the given (state, district) pairs from
+    crop_counts. Each district document is replaced in place, so readers
+    never see a missing or empty entry; untouched districts are not read.
+    """
+    if not districts:
+        return 0
+    pairs = {(st, dist) for st, dist in districts}
+    per_district = {}
+    query = {"$or": [{"state": st, "district": dist} for st, dist in pairs]}
+    for c in db.crop_counts.find(query, {"state": 1, "district": 1, "commodity": 1, "count": 1}):
+        per_district.setdefault((c["state"], c["district"]), []).append(c)
+
+    ops, top_obj = [], {}
+    for (st, dist), counts in per_district.items():
+        top = _rank(counts)
+        top_obj[f"{st}__{dist}"] = top
+        ops.append(ReplaceOne({"state": st, "district": dist},
+                              {"state": st, "district": dist, "top_crops": top}, upsert=True))
+    for i in range(0, len(ops), INGEST_BATCH):
+        db.top_crops.bulk_write(ops[i:i + INGEST_BATCH], ordered=False)
+
+    _write_top_crops_json(update=top_obj)
+    print(f"🏆 Top crops refreshed for {len(top_obj)} districts.")
+    return len(top_obj)
 
 
 def generate_top_crops():
+    """
+    Full rebuild of crop_counts and top_crops from the whole crops collection
+    (backfill / repair). Both are built in staging collections and swapped in
+    with renameCollection, so readers switch from the old set to the new one
+    without an empty window.
+    """
     pipeline = [
-        {"$group": {"_id": {"state": "$state", "district": "$district", "commodity": "$commodity"}, "count": {"$sum": 1}}},
-        {"$group": {"_id": {"state": "$_id.state", "district": "$_id.district"}, "crops": {"$push": {"commodity": "$_id.commodity", "count": "$count"}}}}
+        {"$group": {"_id": {"state": "$state", "district": "$district", "commodity_key": "$commodity_key"},
+                    "commodity": {"$first": "$commodity"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "state": "$_id.state", "district": "$_id.district",
+                      "commodity_key": "$_id.commodity_key", "commodity": 1, "count": 1}},
+        {"$out": "crop_counts_staging"},
     ]
-    res = db.crops.aggregate(pipeline)
+    db.crops.aggregate(pipeline, allowDiskUse=True)
+
+    res = db.crop_counts_staging.aggregate([
+        {"$group": {"_id": {"state": "$state", "district": "$district"},
+                    "crops": {"$push": {"commodity": "$commodity", "count": "$count"}}}},
+    ], allowDiskUse=True)
     top_obj = {}
+    db.top_crops_staging.drop()
+    bulk = []
     for r in res:
-        st = r['_id']['state']
-        dist = r['_id']['district']
-        items = sorted(r['crops'], key=lambda x: -int(x['count']))
-        top_obj[f"{st}__{dist}"] = [it['commodity'] for it in items[:12]]
+        st, dist = r['_id']['state'], r['_id']['district']
+        top_obj[f"{st}__{dist}"] = _rank(r['crops'])
+        bulk.append({"state": st, "district": dist, "top_crops": top_obj[f"{st}__{dist}"]})
+    if bulk:
+        db.top_crops_staging.insert_many(bulk)
+    db.top_crops_staging.create_index([("state", 1), ("district", 1)])
+    db.crop_counts_staging.create_index([("state", 1), ("district", 1), ("commodity_key", 1)], unique=True)
 
-    db.top_crops.delete_many({})
-    bulk = []
-    for k, v in top_obj.items():
-        st, dist = k.split("__")
-        bulk.append({"state": st, "district": dist, "top_crops": v})
+    db.crop_counts_staging.rename("crop_counts", dropTarget=True)
     if bulk:
-        db.top_crops.insert_many(bulk)
+        db.top_crops_staging.rename("top_crops", dropTarget=True)
 
-    Path(DATA_DIR).joinpath("top_crops_by_district.json").write_text(json.dumps(top_obj, indent=2))
+    _write_top_crops_json(replace=top_obj)
+    catalog_service.bump_version()
     print(f"🏆 Top crops computed and stored in 'top_crops' collection. Found {len(top_obj)} district entries.")
 
 
-def run_full_ingest():
+def run_full_ingest(force=False):
     local_csv = Path(DATA_DIR) / "Final.csv"
     if not local_csv.exists():
         raise FileNotFoundError(f"{local_csv} not found. Please place Final.csv in backend/data/")
     
-    clean_and_insert(local_csv)
-    generate_top_crops()
-    return True
+    stats = clean_and_insert(local_csv, force=force)
+    refresh_top_crops(stats["touched_districts"])
+    if stats["inserted"]:
+        # new rows can add states/districts/crops or reorder top crops
+        stats["catalog_version"] = catalog_service.bump_version()
+    return stats
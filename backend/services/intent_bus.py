@@ -0,0 +1,153 @@
+# backend/services/intent_bus.py
+import heapq, os, queue, threading, time, uuid
+from collections import deque
+from config import INTENT_STORE, INTENT_TTL_SECONDS, INTENT_POLL_SECONDS
+
+# Per-district fan-out of sell-intent events to subscribed dealers (SSE / long-poll).
+#
+# Events are {"seq", "type": "new" | "expired", "intent"}; "expired" carries
+# only {"id", "district"}. A new intent is delivered to the subscribers of its
+# district only. Every event gets a process-wide sequence number and the last
+# EVENT_LOG_SIZE events are kept, so a reconnecting client (Last-Event-ID /
+# ?since=) can catch up without a full refresh.
+#
+# Sequence numbers only order events within one bus, so clients get cursors
+# "<epoch>-<seq>" where the epoch is random per process (renewed after fork).
+# A cursor issued by another worker, or before a restart, does not parse here
+# and the client gets a fresh snapshot instead of skipped or replayed events.
+#
+# Expiry events come from a heap of (expires_at, intent) drained by a reaper
+# thread, started by the first publish or subscribe. With KM_INTENT_STORE=mongo a poller thread also reads intents posted
+# on other workers from `sell_intents` every KM_INTENT_POLL_SECONDS (one query
+# per process, however many dealers are connected).
+EVENT_LOG_SIZE = 1000
+SUBSCRIBER_QUEUE = 256
+
+
+class Subscriber:
+    def __init__(self, districts):
+        self.districts = set(districts)
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE)
+        self.overflow = False   # events were dropped; the client needs a fresh snapshot
+
+
+class IntentBus:
+    def __init__(self, ttl=INTENT_TTL_SECONDS):
+        self.ttl = ttl
+        self._subs = {}          # district -> {Subscriber}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._log = deque(maxlen=EVENT_LOG_SIZE)   # (district, event)
+        self._expiry = []        # (expires_at, seq, intent)
+        self._live = set()       # ids published and not yet expired
+        self._threads_started = False
+        self.epoch = uuid.uuid4().hex[:12]
+
+    # ---- subscriptions ----
+    def subscribe(self, districts):
+        self._start_threads()
+        sub = Subscriber(districts)
+        with self._lock:
+            for d in sub.districts:
+                self._subs.setdefault(d, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for d in sub.districts:
+                subs = self._subs.get(d)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[d]
+
+    # ---- publishing ----
+    def publish_new(self, intent):
+        self._start_threads()  # the reaper bounds _expiry/_live even while nobody is subscribed
+        with self._lock:
+            if intent["id"] in self._live:
+                return
+            self._live.add(intent["id"])
+            self._emit("new", intent)
+            heapq.heappush(self._expiry, (intent["timestamp"] + self.ttl, self._seq, intent))
+
+    def _emit(self, kind, intent):
+        # caller holds _lock
+        self._seq += 1
+        event = {"seq": self._seq, "type": kind, "intent": intent}
+        self._log.append((intent["district"], event))
+        for sub in self._subs.get(intent["district"], ()):
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                sub.overflow = True
+
+    # ---- catch-up ----
+    @property
+    def seq(self):
+        with self._lock:
+            return self._seq
+
+    def cursor(self, seq=None):
+        """Client cursor for `seq` (default: the latest event)."""
+        return f"{self.epoch}-{self.seq if seq is None else seq}"
+
+    def parse_cursor(self, cursor):
+        """The seq of a cursor issued by this bus, else None."""
+        epoch, _, seq = (cursor or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq, districts):
+        """
+        Events after `seq` for `districts`, or None if some of them already
+        fell out of the log or seq is None (the caller should send a fresh snapshot).
+        """
+        if seq is None:
+            return None
+        districts = set(districts)
+        with self._lock:
+            if seq > self._seq:
+                return None  # cursor from before a restart
+            if seq < self._seq and self._log[0][1]["seq"] > seq + 1:
+                return None
+            return [e for d, e in self._log if e["seq"] > seq and d in districts]
+
+    # ---- background threads ----
+    def _start_threads(self):
+        with self._lock:
+            if self._threads_started:
+                return
+            self._threads_started = True
+        threading.Thread(target=self._reap_loop, daemon=True, name="intent-reaper").start()
+        if INTENT_STORE == "mongo":
+            threading.Thread(target=self._poll_loop, daemon=True, name="intent-poller").start()
+
+    def _reap_loop(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                while self._expiry and self._expiry[0][0] <= now:
+                    _, _, intent = heapq.heappop(self._expiry)
+                    self._live.discard(intent["id"])
+                    self._emit("expired", {"id": intent["id"], "district": intent["district"]})
+                wait = self._expiry[0][0] - now if self._expiry else 1.0
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+    def _poll_loop(self):
+        from services.intent_store import store
+        last = time.time() - self.ttl
+        while True:
+            try:
+                for intent in store.newer_than(last - 1.0):  # 1 s margin for clock skew between workers
+                    last = max(last, intent["timestamp"])
+                    self.publish_new(intent)
+            except Exception as e:
+                print(f"⚠ intent poller: {e}")
+            time.sleep(INTENT_POLL_SECONDS)
+
+
+bus = IntentBus()
+# forked workers (gunicorn preload) must not share the master's cursor epoch
+os.register_at_fork(after_in_child=lambda: setattr(bus, "epoch", uuid.uuid4().hex[:12]))
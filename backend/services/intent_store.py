@@ -0,0 +1,90 @@
+# backend/services/intent_store.py
+import heapq, threading, time, uuid, datetime
+from config import INTENT_STORE, INTENT_TTL_SECONDS
+
+# Active farmer sell intents, kept for INTENT_TTL_SECONDS after posting.
+#
+# KM_INTENT_STORE=memory (default): per-process store indexed by district with
+# a min-heap of expiry times, so expiry pops only what is due and a dealer
+# lookup touches only intents in the dealer's districts.
+# KM_INTENT_STORE=mongo: the `sell_intents` collection (TTL index + district
+# index), shared by every worker.
+#
+# Intents are plain dicts: the posted fields plus "id" and "timestamp" (epoch seconds).
+
+
+class MemoryIntentStore:
+    def __init__(self, ttl=INTENT_TTL_SECONDS):
+        self.ttl = ttl
+        self._by_district = {}   # district -> {id: intent}, in posting order
+        self._heap = []          # (expires_at, id, district)
+        self._lock = threading.Lock()
+
+    def add(self, intent):
+        now = time.time()
+        intent = {**intent, "id": uuid.uuid4().hex, "timestamp": now}
+        with self._lock:
+            self._expire(now)
+            self._by_district.setdefault(intent["district"], {})[intent["id"]] = intent
+            heapq.heappush(self._heap, (now + self.ttl, intent["id"], intent["district"]))
+        return dict(intent)
+
+    def _expire(self, now):
+        # caller holds _lock
+        while self._heap and self._heap[0][0] <= now:
+            _, intent_id, district = heapq.heappop(self._heap)
+            bucket = self._by_district.get(district)
+            if bucket is not None and bucket.pop(intent_id, None) is not None and not bucket:
+                del self._by_district[district]
+
+    def for_districts(self, districts):
+        """Active intents in any of `districts`, oldest first."""
+        with self._lock:
+            self._expire(time.time())
+            found = [dict(i) for d in set(districts) for i in self._by_district.get(d, {}).values()]
+        return sorted(found, key=lambda i: i["timestamp"])
+
+
+class MongoIntentStore:
+    def __init__(self, ttl=INTENT_TTL_SECONDS):
+        self.ttl = ttl
+        self._ready = False
+
+    def _collection(self):
+        from services.mongo_client import db
+        coll = db.sell_intents
+        if not self._ready:
+            coll.create_index("created_at", expireAfterSeconds=self.ttl)
+            coll.create_index([("district", 1), ("created_at", 1)])
+            self._ready = True
+        return coll
+
+    def add(self, intent):
+        now = time.time()
+        intent = {**intent, "id": uuid.uuid4().hex, "timestamp": now}
+        self._collection().insert_one({**intent, "_id": intent["id"],
+                                       "created_at": datetime.datetime.utcfromtimestamp(now)})
+        return intent
+
+    def for_districts(self, districts):
+        # the TTL monitor deletes expired documents only about once a minute,
+        # so reads also filter on created_at
+        cursor = self._collection().find(
+            {"district": {"$in": list(set(districts))}, "created_at": {"$gt": self._cutoff()}},
+            {"_id": 0, "created_at": 0},
+        ).sort("created_at", 1)
+        return list(cursor)
+
+    def newer_than(self, ts):
+        """Active intents posted after epoch time `ts`, oldest first (feeds intent_bus on other workers)."""
+        cursor = self._collection().find(
+            {"created_at": {"$gt": max(self._cutoff(), datetime.datetime.utcfromtimestamp(ts))}},
+            {"_id": 0, "created_at": 0},
+        ).sort("created_at", 1)
+        return list(cursor)
+
+    def _cutoff(self):
+        return datetime.datetime.utcfromtimestamp(time.time() - self.ttl)
+
+
+store = MongoIntentStore() if INTENT_STORE == "mongo" else MemoryIntentStore()
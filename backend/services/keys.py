@@ -0,0 +1,15 @@
+# backend/services/keys.py
+
+
+def commodity_key(name):
+    """
+    Normalised commodity name stored next to `commodity` on every crops doc.
+    Lookups match on this exact key (index-friendly) instead of a
+    case-insensitive regex over the raw name.
+    """
+    return " ".join(str(name).split()).lower()
+
+
+def commodity_keys(names):
+    """Vectorised commodity_key for a pandas Series of names."""
+    return names.astype(str).str.split().str.join(" ").str.lower()
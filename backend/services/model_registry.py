@@ -0,0 +1,142 @@
+# backend/services/model_registry.py
+import os, threading, joblib
+from collections import OrderedDict
+from services.rollout_service import keras_predict_fn
+from services import global_model_service, numpy_lstm
+from config import MODELS_DIR, MODEL_CACHE_SIZE, FORECAST_MODE, INFERENCE_ENGINE
+
+# Process-wide LRU of loaded (state, crop) -> (model, scaler).
+# Each entry remembers the file version it was loaded from, so a model
+# rewritten by train_service is picked up on the next lookup.
+#
+# With KM_INFERENCE_ENGINE=numpy (default) the per-pair models are served by
+# numpy_lstm and TensorFlow is never imported; "keras" loads the .h5 with Keras.
+_cache = OrderedDict()
+_lock = threading.Lock()
+_load_locks = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "reloads": 0}
+
+
+def model_paths(state, crop):
+    model_path = os.path.join(MODELS_DIR, f"{state}__{crop}__model.h5")
+    scaler_path = os.path.join(MODELS_DIR, f"{state}__{crop}__scaler.pkl")
+    return model_path, scaler_path
+
+
+def model_version(state, crop):
+    """
+    Version of the files on disk for (state, crop): (model mtime_ns, size, scaler mtime_ns, size).
+    Returns None when either file is missing.
+    """
+    model_path, scaler_path = model_paths(state, crop)
+    try:
+        m, s = os.stat(model_path), os.stat(scaler_path)
+    except OSError:
+        return None
+    return (m.st_mtime_ns, m.st_size, s.st_mtime_ns, s.st_size)
+
+
+def get_model_and_scaler(state, crop):
+    """
+    Returns (model, scaler) for (state, crop), loading from disk on a miss
+    or when the files changed since they were cached. Returns (None, None)
+    if there is no trained model.
+    """
+    key = (state, crop)
+    version = model_version(state, crop)
+    if version is None:
+        invalidate(state, crop)
+        return None, None
+
+    with _lock:
+        entry = _lookup(key, version)
+        if entry is not None:
+            return entry["model"], entry["scaler"]
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # One loader per pair; concurrent misses for the same pair wait here
+    # instead of reading the same files again, other pairs are not blocked.
+    with load_lock:
+        with _lock:
+            entry = _cache.get(key)
+            if entry is not None and entry["version"] == version:
+                _cache.move_to_end(key)
+                return entry["model"], entry["scaler"]
+
+        model_path, scaler_path = model_paths(state, crop)
+        scaler = joblib.load(scaler_path)
+        model = _load_model(model_path)
+
+        with _lock:
+            _cache[key] = {"model": model, "scaler": scaler, "version": version}
+            _cache.move_to_end(key)
+            while len(_cache) > MODEL_CACHE_SIZE:
+                _cache.popitem(last=False)
+                _stats["evictions"] += 1
+        return model, scaler
+
+
+def _load_model(model_path):
+    if INFERENCE_ENGINE == "keras":
+        from tensorflow.keras.models import load_model
+        return load_model(model_path, compile=False)  # inference only, skip optimizer restore
+    return numpy_lstm.load(model_path)
+
+
+def _lookup(key, version):
+    # caller holds _lock
+    entry = _cache.get(key)
+    if entry is not None and entry["version"] == version:
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return entry
+    if entry is not None:
+        _stats["reloads"] += 1
+    else:
+        _stats["misses"] += 1
+    return None
+
+
+def get_predictor(state, crop):
+    """
+    (predict_fn, scaler) serving (state, crop) in the configured KM_FORECAST_MODE:
+    the per-pair model, or the global multi-series model. (None, None) if there is none.
+    """
+    if FORECAST_MODE == "global":
+        predict_fn = global_model_service.predict_fn_for([(state, crop)])
+        if predict_fn is None:
+            return None, None
+        return predict_fn, global_model_service.get_scaler(state, crop)
+    model, scaler = get_model_and_scaler(state, crop)
+    if model is None:
+        return None, None
+    if isinstance(model, numpy_lstm.NumpyLSTM):
+        return model, scaler
+    return keras_predict_fn(model), scaler
+
+
+def predictor_version(state, crop):
+    """File version behind get_predictor(state, crop); None if no model serves the pair."""
+    if FORECAST_MODE == "global":
+        if global_model_service.get_scaler(state, crop) is None:
+            return None
+        return ("global",) + global_model_service.global_version()
+    return model_version(state, crop)
+
+
+def invalidate(state, crop):
+    """Drop a cached pair (e.g. after retraining)."""
+    with _lock:
+        _cache.pop((state, crop), None)
+
+
+def registry_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"] + _stats["reloads"]
+        return {
+            **_stats,
+            "size": len(_cache),
+            "capacity": MODEL_CACHE_SIZE,
+            "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "cached": [f"{s}__{c}" for s, c in _cache.keys()],
+        }
@@ -1,16 +1,47 @@
 # backend/services/mongo_client.py
-import os
+import os, threading
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
 # Load .env variables
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise ValueError("MONGO_URI not found in environment variables.")
+# The client is created on first use rather than at import, so importing a
+# route or service (and app startup) never waits on Mongo. `db` stays the
+# module-level handle everything imports; it resolves to the real Database
+# the first time an attribute is touched.
+_client = None
+_db = None
+_lock = threading.Lock()
 
-client = MongoClient(MONGO_URI)
-db = client.get_database()  # Will use the DB name from your URI
 
-print(f"✅ Connected to MongoDB: {db.name}")
\ No newline at end of file
+def get_db():
+    global _client, _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                uri = os.getenv("MONGO_URI")
+                if not uri:
+                    raise ValueError("MONGO_URI not found in environment variables.")
+                _client = MongoClient(uri)
+                _db = _client.get_database()  # Will use the DB name from your URI
+                print(f"✅ Connected to MongoDB: {_db.name}")
+    return _db
+
+
+class _LazyDatabase:
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+
+db = _LazyDatabase()
+
+
+def reset():
+    """Forget the client without using it, e.g. in a freshly forked worker (MongoClient is not fork-safe)."""
+    global _client, _db
+    with _lock:
+        _client, _db = None, None
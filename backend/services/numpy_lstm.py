@@ -0,0 +1,124 @@
+# backend/services/numpy_lstm.py
+import os, tempfile
+import numpy as np
+
+# TensorFlow-free inference for the per-pair LSTM(units) -> Dropout -> Dense(horizon)
+# models. Weights are pulled straight out of the Keras .h5 file with h5py and
+# cached next to it as {state}__{crop}__model.npz:
+#
+#   lstm_kernel (1, 4U)  lstm_recurrent (U, 4U)  lstm_bias (4U,)
+#   dense_kernel (U, H)  dense_bias (H,)
+#
+# Gate layout follows Keras: [input, forget, cell, output].
+#
+# The parity test against Keras is `python export_numpy_models.py --check`
+# (needs TensorFlow and the trained models, so it is a script, not a unit test).
+
+WEIGHT_KEYS = ("lstm_kernel", "lstm_recurrent", "lstm_bias", "dense_kernel", "dense_bias")
+
+
+def npz_path_for(h5_path):
+    return h5_path[:-len(".h5")] + ".npz" if h5_path.endswith(".h5") else h5_path + ".npz"
+
+
+def _h5_layers(f):
+    """[(layer_name, {weight_suffix: array})] in model order from a Keras .h5 file."""
+    root = f["model_weights"] if "model_weights" in f else f
+    names = [n.decode() if isinstance(n, bytes) else n for n in root.attrs["layer_names"]]
+    layers = []
+    for name in names:
+        g = root[name]
+        wnames = [w.decode() if isinstance(w, bytes) else w for w in g.attrs.get("weight_names", [])]
+        if wnames:
+            layers.append((name, {w.split("/")[-1].split(":")[0]: np.asarray(g[w]) for w in wnames}))
+    return layers
+
+
+def read_h5_weights(h5_path):
+    """LSTM + Dense weights of a per-pair model, read with h5py (no TensorFlow)."""
+    import h5py
+    with h5py.File(h5_path, "r") as f:
+        layers = _h5_layers(f)
+    lstm = next(w for _, w in layers if "recurrent_kernel" in w)
+    dense = [w for _, w in layers if "recurrent_kernel" not in w and set(w) == {"kernel", "bias"}][-1]
+    return {
+        "lstm_kernel": lstm["kernel"].astype(np.float32),
+        "lstm_recurrent": lstm["recurrent_kernel"].astype(np.float32),
+        "lstm_bias": lstm["bias"].astype(np.float32),
+        "dense_kernel": dense["kernel"].astype(np.float32),
+        "dense_bias": dense["bias"].astype(np.float32),
+    }
+
+
+def export_h5(h5_path, npz_path=None):
+    """Write the compact .npz for a Keras .h5 model; returns its path."""
+    npz_path = npz_path or npz_path_for(h5_path)
+    weights = read_h5_weights(h5_path)
+    # unique temp name: several workers (or training and serving) may export the same model at once
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(npz_path) or ".", prefix=os.path.basename(npz_path) + ".",
+                               suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **weights)
+        os.replace(tmp, npz_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return npz_path
+
+
+def load(h5_path):
+    """
+    NumpyLSTM for a .h5 model, using the cached .npz when it is at least as new
+    as the .h5 and (re-)exporting it otherwise.
+    """
+    npz_path = npz_path_for(h5_path)
+    try:
+        fresh = os.stat(npz_path).st_mtime_ns >= os.stat(h5_path).st_mtime_ns
+    except OSError:
+        fresh = False
+    if not fresh:
+        try:
+            export_h5(h5_path, npz_path)
+        except OSError:
+            # read-only models dir: serve straight from the .h5
+            return NumpyLSTM(read_h5_weights(h5_path))
+    with np.load(npz_path) as z:
+        return NumpyLSTM({k: z[k] for k in WEIGHT_KEYS})
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyLSTM:
+    """Batched forward pass: (B, T, 1) windows -> (B, horizon), same math as the Keras stack in inference mode."""
+
+    def __init__(self, weights):
+        self.W = weights["lstm_kernel"]
+        self.U = weights["lstm_recurrent"]
+        self.b = weights["lstm_bias"]
+        self.Wd = weights["dense_kernel"]
+        self.bd = weights["dense_bias"]
+        self.units = self.U.shape[0]
+
+    def __call__(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        B, T = X.shape[0], X.shape[1]
+        n = self.units
+        xw = X.reshape(B * T, -1) @ self.W + self.b   # input projection for all steps at once
+        xw = xw.reshape(B, T, 4 * n)
+        h = np.zeros((B, n), dtype=np.float32)
+        c = np.zeros((B, n), dtype=np.float32)
+        for t in range(T):
+            z = xw[:, t] + h @ self.U
+            i = _sigmoid(z[:, :n])
+            f = _sigmoid(z[:, n:2 * n])
+            g = np.tanh(z[:, 2 * n:3 * n])
+            o = _sigmoid(z[:, 3 * n:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+        return h @ self.Wd + self.bd
@@ -1,9 +1,21 @@
 # backend/services/predict_service.py
-import os, joblib, numpy as np, datetime
+import datetime, logging, time
 import pandas as pd
 from services.mongo_client import db
-from tensorflow.keras.models import load_model
-from config import MODELS_DIR, SEQ_LEN, PRED_HORIZON
+from services.model_registry import get_predictor, predictor_version
+from services import global_model_service
+from services import forecast_cache
+from services.series_service import load_record, to_series
+from services.keys import commodity_key
+from services.rollout_service import rollout, inverse_scale
+from services.inference_batcher import batched_rollout
+from services.singleflight import SingleFlight
+from config import SEQ_LEN, PRED_HORIZON, MAX_ROLLOUT_DAYS, MAX_BATCH_TARGETS, FORECAST_MODE
+
+log = logging.getLogger(__name__)
+
+_prepare_flight = SingleFlight("history")
+_forecast_flight = SingleFlight("forecast")
 
 
 def _parse_target_date(as_of_date_str):
@@ -35,40 +47,35 @@ def _parse_target_date(as_of_date_str):
     raise ValueError(f"Invalid as_of_date format: {as_of_date_str}")
 
 
-def predict_state_crop(state, district, crop, as_of_date=None):
+def _load_history(state, district, crop):
     """
-    On-demand prediction (no DB write).
-    Forecast window is aligned to the end of historical data so results are consistent across runs.
-
-    Behavior:
-    - Let hist_end = last date present in the historical series.
-    - We recursively forecast day-by-day from (hist_end + 1) forward.
-    - If as_of_date is None => start graph from (hist_end + 1).
-      Else => start graph from max(as_of_date, hist_end + 1).
-    - We return exactly PRED_HORIZON days starting from that start date (inclusive).
-
-    This ensures that the price you see for, say, 21/08 in a run on 18/08
-    will match the price returned when you run directly for 21/08 (assuming history unchanged).
+    Dense daily series for a district (else the state-pooled series).
+    Returns (series, district_used, rev); district_used is None for the pooled
+    series and rev is the record's revision (0 for unmaterialised pairs).
+    Reads the materialised `series` record; falls back to raw `crops` docs for
+    pairs that have not been materialised yet.
     """
+    rec, source = load_record(state, district, crop)
+    if rec is not None:
+        series = to_series(rec)
+        if series is not None:
+            return series, source, rec.get("rev", 0)
 
-    # --- 1) Load historical docs (prefer district, else pool state) ---
-    query = {"state": state, "commodity": {"$regex": f"^{crop}$", "$options": "i"}}
-    if district:
-        query["district"] = district
-
-    docs = list(db.crops.find(query, {"date": 1, "price": 1}))
+    query = {"state": state, "commodity_key": commodity_key(crop)}
+    docs = list(db.crops.find({**query, "district": district}, {"date": 1, "price": 1})) if district else []
+    source = district if docs else None
     if not docs:
-        docs = list(
-            db.crops.find(
-                {"state": state, "commodity": {"$regex": f"^{crop}$", "$options": "i"}},
-                {"date": 1, "price": 1},
-            )
-        )
+        docs = list(db.crops.find(query, {"date": 1, "price": 1}))
         if not docs:
-            return {"error": "no data"}
+            return None, None, 0
+    return _daily_series(docs), source, 0
 
-    # --- 2) Aggregate by date & build dense daily series ---
-    # If multiple entries per date, average them.
+
+def _daily_series(docs):
+    """
+    Aggregate raw {"date", "price"} docs by date (averaging duplicates) and
+    build the dense daily, interpolated price series.
+    """
     date_map = {}
     for d in docs:
         date_map.setdefault(d["date"], []).append(d["price"])
@@ -79,32 +86,16 @@ def predict_state_crop(state, district, crop, as_of_date=None):
     s["date"] = pd.to_datetime(s["date"])
     s = s.set_index("date").resample("D").mean()
     s["price"] = s["price"].interpolate(limit_direction="both")
+    return s["price"]
 
-    if len(s) < SEQ_LEN:
-        return {"error": "insufficient history"}
 
-    # The true anchor for forecasting is the LAST historical date we have:
-    hist_end = s.index.max().date()
-
-    # --- 3) Load model & scaler ---
-    model_path = os.path.join(MODELS_DIR, f"{state}__{crop}__model.h5")
-    scaler_path = os.path.join(MODELS_DIR, f"{state}__{crop}__scaler.pkl")
-    if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
-        return {"error": "no trained model for this state/crop"}
-
-    scaler = joblib.load(scaler_path)
-    model = load_model(model_path)
-
-    # --- 4) Scale historical series & seed the sequence ---
-    arr = s["price"].values.astype(float)
-    scaled_hist = scaler.transform(arr.reshape(-1, 1)).flatten().tolist()
-    seq = scaled_hist[-SEQ_LEN:].copy()
-
-    # --- 5) Decide forecast start date (inclusive) ---
-    try:
-        wanted = _parse_target_date(as_of_date) if as_of_date else None
-    except ValueError as e:
-        return {"error": str(e)}
+def _forecast_window(hist_end, as_of_date):
+    """
+    Decide the forecast start date (inclusive) for a series ending at hist_end.
+    Returns (first_forecast_day, start_date, total_days_needed); raises ValueError
+    for an unparseable date or one beyond MAX_ROLLOUT_DAYS.
+    """
+    wanted = _parse_target_date(as_of_date) if as_of_date else None
 
     # First possible forecasted day is hist_end + 1
     first_forecast_day = hist_end + datetime.timedelta(days=1)
@@ -123,29 +114,20 @@ def predict_state_crop(state, district, crop, as_of_date=None):
         # Extremely unlikely with the clamping above, but guard anyway
         total_days_needed = PRED_HORIZON
 
-    # --- 6) Generate the entire forward path once ---
-    forward_all = []  # list of {"date": iso, "price": float}
-    for i in range(total_days_needed):
-        X = np.array(seq[-SEQ_LEN:]).reshape(1, SEQ_LEN, 1)
-        next_scaled = model.predict(X, verbose=0)[0][0]
-        seq.append(next_scaled)
+    if total_days_needed > MAX_ROLLOUT_DAYS:
+        raise ValueError(
+            f"date too far beyond available history (max {MAX_ROLLOUT_DAYS} days after {hist_end.isoformat()})"
+        )
+    return first_forecast_day, start_date, total_days_needed
 
-        price = float(scaler.inverse_transform([[next_scaled]])[0][0])
-        d = first_forecast_day + datetime.timedelta(days=i)
-        forward_all.append({"date": d.isoformat(), "price": round(price, 2)})
 
-    # Extract the window that starts at start_date (inclusive)
+def _result(state, district, crop, first_forecast_day, start_date, prices):
+    """Build the response for the PRED_HORIZON days starting at start_date from a forward price path."""
     start_idx = (start_date - first_forecast_day).days
-    window = forward_all[start_idx : start_idx + PRED_HORIZON]
-
-    # --- Debug prints to verify alignment in your logs ---
-    print(
-        f"[predict_service] hist_end={hist_end} first_forecast_day={first_forecast_day} "
-        f"wanted={wanted} start_date={start_date} total_days_needed={total_days_needed} "
-        f"start_idx={start_idx} horizon={PRED_HORIZON}"
-    )
-
-    # --- 7) Return result (NO DB storage) ---
+    window = [
+        {"date": (start_date + datetime.timedelta(days=i)).isoformat(), "price": round(float(p), 2)}
+        for i, p in enumerate(prices[start_idx : start_idx + PRED_HORIZON])
+    ]
     return {
         "state": state,
         "district": district,
@@ -154,3 +136,226 @@ def predict_state_crop(state, district, crop, as_of_date=None):
         "target_price": window[0]["price"],   # price for the selected as_of_date
         "predictions": window,                # PRED_HORIZON days starting at as_of_date
     }
+
+
+def predict_state_crop(state, district, crop, as_of_date=None, on_version=None):
+    """
+    On-demand prediction (no DB write).
+    Forecast window is aligned to the end of historical data so results are consistent across runs.
+
+    Behavior:
+    - Let hist_end = last date present in the historical series.
+    - We recursively forecast from (hist_end + 1) forward; each model call uses all
+      PRED_HORIZON outputs, so one forward pass advances PRED_HORIZON days.
+    - If as_of_date is None => start graph from (hist_end + 1).
+      Else => start graph from max(as_of_date, hist_end + 1).
+    - We return exactly PRED_HORIZON days starting from that start date (inclusive).
+
+    This ensures that the price you see for, say, 21/08 in a run on 18/08
+    will match the price returned when you run directly for 21/08 (assuming history unchanged).
+
+    on_version(key), if given, is called with the key of the inputs the forecast
+    is built from (series, hist_end, model version, start date) before anything
+    is computed; if it returns True the forecast is skipped and None returned
+    (the route uses this to answer conditional requests with 304).
+
+    Identical concurrent requests are coalesced (services.singleflight): the
+    history load runs once per (state, district, crop, date) in flight, the
+    rollout once per forecast key in flight; the other callers share the result.
+    """
+    t0 = time.perf_counter()
+
+    # --- 1-3) Series, forecast window, model version -> forecast key ---
+    prep, _ = _prepare_flight.do((state, district, crop, as_of_date),
+                                 lambda: _prepare(state, district, crop, as_of_date))
+    if "error" in prep:
+        return dict(prep)
+    key = prep["key"]
+    if on_version is not None and on_version(key):
+        return None
+
+    # --- Cached result for (series, hist_end, model version, start date)? ---
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        forecast_cache.record_latency(True, time.perf_counter() - t0)
+        return {**cached, "district": district}
+
+    def compute():
+        res = _forecast(state, district, crop, prep["series"], prep["window"], prep["version"])
+        if "error" not in res:
+            forecast_cache.put(key, res, state, crop, prep["source"])
+        return res
+
+    res, shared = _forecast_flight.do(key, compute)
+    forecast_cache.record_latency(False, time.perf_counter() - t0)
+    return {**res, "district": district} if shared and "error" not in res else dict(res)
+
+
+def _prepare(state, district, crop, as_of_date):
+    """Series, source, forecast window, model version and forecast-cache key for a request (or {"error": ...})."""
+    # --- 1) Load the dense daily series (prefer district, else pool state) ---
+    series, source, rev = _load_history(state, district, crop)
+    if series is None:
+        return {"error": "no data"}
+    if len(series) < SEQ_LEN:
+        return {"error": "insufficient history"}
+
+    # The true anchor for forecasting is the LAST historical date we have:
+    hist_end = series.index.max().date()
+
+    # --- 2) Decide forecast start date (inclusive) ---
+    try:
+        window = _forecast_window(hist_end, as_of_date)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    # --- 3) Key of (series revision, hist_end, model version, start date) ---
+    version = predictor_version(state, crop)
+    if version is None:
+        return {"error": "no trained model for this state/crop"}
+    key = forecast_cache.make_key(state, source, crop, rev, hist_end, version, window[1])
+    return {"series": series, "source": source, "window": window, "version": version, "key": key}
+
+
+def coalescing_stats():
+    return {"history": _prepare_flight.stats(), "forecast": _forecast_flight.stats()}
+
+
+def _forecast(state, district, crop, series, window, version):
+    """
+    Model rollout for one series; window is (first_forecast_day, start_date, total_days_needed).
+    Per-pair models are stepped through inference_batcher, so concurrent requests
+    for the same model (version) share forward passes.
+    """
+    first_forecast_day, start_date, total_days_needed = window
+
+    # --- 4) Load model & scaler (cached per process, reloaded if retrained) ---
+    predict_fn, scaler = get_predictor(state, crop)
+    if predict_fn is None:
+        return {"error": "no trained model for this state/crop"}
+
+    # --- 5) Scale historical series & seed the sequence ---
+    arr = series.values.astype(float)
+    seq = scaler.transform(arr.reshape(-1, 1)).flatten()[-SEQ_LEN:]
+
+    # --- 6) Generate the entire forward path once ---
+    if FORECAST_MODE == "global":
+        # the global predict_fn carries per-row state/crop ids, so it is not merged here
+        scaled_path = rollout(predict_fn, seq, total_days_needed)
+    else:
+        scaled_path = batched_rollout((state, crop, version), predict_fn, seq, total_days_needed)
+    prices = inverse_scale(scaler, scaled_path)[0]
+
+    # --- Debug log to verify alignment (enable DEBUG for services.predict_service) ---
+    log.debug("hist_end=%s first_forecast_day=%s start_date=%s total_days_needed=%s horizon=%s",
+              first_forecast_day - datetime.timedelta(days=1), first_forecast_day, start_date,
+              total_days_needed, PRED_HORIZON)
+
+    # --- 7) Return result (NO DB storage) ---
+    return _result(state, district, crop, first_forecast_day, start_date, prices)
+
+
+def predict_batch(targets):
+    """
+    Forecast many {"state", "district", "crop", "date"} targets in one go.
+
+    - The series records for all distinct (state, crop) pairs are fetched with a
+      single query (raw `crops` docs only for pairs not materialised yet).
+    - Targets sharing a model are rolled out together: their seed windows are
+      stacked into one (B, SEQ_LEN, 1) batch per forward pass.
+    - Results come back in request order; a failing item gets {"error": ...}
+      without affecting the others.
+    """
+    if len(targets) > MAX_BATCH_TARGETS:
+        raise ValueError(f"too many targets (max {MAX_BATCH_TARGETS})")
+
+    results = [None] * len(targets)
+    items = []
+    for i, t in enumerate(targets):
+        t = t if isinstance(t, dict) else {}
+        state, crop = (t.get("state") or "").strip(), (t.get("crop") or "").strip()
+        district = (t.get("district") or "").strip()
+        if not state or not crop:
+            results[i] = {"error": "state and crop required"}
+            continue
+        items.append({"i": i, "state": state, "district": district, "crop": crop, "date": t.get("date")})
+
+    # --- 1) One query for every (state, crop) in the batch ---
+    pairs = {(it["state"], commodity_key(it["crop"])) for it in items}
+    history = {}  # (state, commodity_key) -> {district or None: series}
+    if pairs:
+        for rec in db.series.find({"$or": [{"state": st, "crop": ck} for st, ck in pairs]}):
+            history.setdefault((rec["state"], rec["crop"]), {})[rec["district"]] = to_series(rec)
+        missing = [p for p in pairs if None not in history.get(p, {})]
+        if missing:
+            # not materialised yet: build from raw docs
+            raw = {}
+            query = {"$or": [{"state": st, "commodity_key": ck} for st, ck in missing]}
+            for d in db.crops.find(query, {"state": 1, "district": 1, "commodity_key": 1, "date": 1, "price": 1}):
+                key = (d["state"], d["commodity_key"])
+                raw.setdefault(key, {}).setdefault(d.get("district"), []).append(d)
+            for key, by_district in raw.items():
+                pooled = [d for ds in by_district.values() for d in ds]
+                history[key] = {dist: _daily_series(ds) for dist, ds in by_district.items()}
+                history[key][None] = _daily_series(pooled)
+
+    # --- 2) Series + forecast window per item, grouped by model ---
+    groups = {}
+    for it in items:
+        by_district = history.get((it["state"], commodity_key(it["crop"])))
+        if not by_district or None not in by_district:
+            results[it["i"]] = {"error": "no data"}
+            continue
+        series = by_district.get(it["district"]) if it["district"] else None
+        if series is None:
+            series = by_district[None]
+        if series is None or len(series) < SEQ_LEN:
+            results[it["i"]] = {"error": "insufficient history"}
+            continue
+        try:
+            it["window"] = _forecast_window(series.index.max().date(), it["date"])
+        except ValueError as e:
+            results[it["i"]] = {"error": str(e)}
+            continue
+        it["series"] = series.values.astype(float)
+        groups.setdefault((it["state"], it["crop"]), []).append(it)
+
+    # --- 3) One stacked rollout per model (one for everything with the global model) ---
+    if FORECAST_MODE == "global":
+        _rollout_global([it for group in groups.values() for it in group], results)
+        return results
+
+    for (state, crop), group in groups.items():
+        predict_fn, scaler = get_predictor(state, crop)
+        if predict_fn is None:
+            for it in group:
+                results[it["i"]] = {"error": "no trained model for this state/crop"}
+            continue
+        seeds = [scaler.transform(it["series"].reshape(-1, 1)).flatten()[-SEQ_LEN:] for it in group]
+        steps = max(it["window"][2] for it in group)
+        prices = inverse_scale(scaler, rollout(predict_fn, seeds, steps))
+        for row, it in zip(prices, group):
+            first_forecast_day, start_date, _ = it["window"]
+            results[it["i"]] = _result(state, it["district"], it["crop"], first_forecast_day, start_date, row)
+
+    return results
+
+
+def _rollout_global(items, results):
+    """Batch items of any (state, crop) through the global model in a single stacked rollout."""
+    ready = []
+    for it in items:
+        it["scaler"] = global_model_service.get_scaler(it["state"], it["crop"])
+        if it["scaler"] is None:
+            results[it["i"]] = {"error": "no trained model for this state/crop"}
+        else:
+            ready.append(it)
+    if not ready:
+        return
+    predict_fn = global_model_service.predict_fn_for([(it["state"], it["crop"]) for it in ready])
+    seeds = [it["scaler"].transform(it["series"])[-SEQ_LEN:] for it in ready]
+    scaled = rollout(predict_fn, seeds, max(it["window"][2] for it in ready))
+    for row, it in zip(scaled, ready):
+        first_forecast_day, start_date, _ = it["window"]
+        prices = it["scaler"].inverse_transform(row)
+        results[it["i"]] = _result(it["state"], it["district"], it["crop"], first_forecast_day, start_date, prices)
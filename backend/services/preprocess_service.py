@@ -1,28 +1,55 @@
 # backend/services/preprocess_service.py
-import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import StandardScaler
 import joblib
 from config import SEQ_LEN
 from pathlib import Path
 
-def load_series_from_docs(docs):
-    # docs: list of {"date": iso, "price": float} unsorted
-    df = pd.DataFrame(docs)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date').set_index('date').resample('D').mean()
-    df['price'] = df['price'].interpolate(limit_direction='both')
-    return df['price'].astype(float)
+def window_views(values, seq_len=SEQ_LEN, horizon=7):
+    """
+    All training windows of a 1-D series as read-only strided views:
+    X (N, seq_len, 1) and y (N, horizon) share memory with `values`, so
+    they cost O(len(values)) rather than N * (seq_len + horizon).
+    """
+    arr = np.ascontiguousarray(values, dtype=np.float32)
+    if len(arr) < seq_len + horizon:
+        return np.empty((0, seq_len, 1), dtype=np.float32), np.empty((0, horizon), dtype=np.float32)
+    windows = sliding_window_view(arr, seq_len + horizon)
+    return windows[:, :seq_len, None], windows[:, seq_len:]
 
 def create_sequences(series, seq_len=SEQ_LEN, horizon=7):
-    X, y = [], []
-    arr = series.values
-    for i in range(len(arr) - seq_len - horizon + 1):
-        X.append(arr[i:i+seq_len])
-        y.append(arr[i+seq_len:i+seq_len+horizon])
-    X = np.array(X)[:, :, None]
-    y = np.array(y)
-    return X, y
+    """Materialised (copied) windows, for callers that concatenate several series."""
+    X, y = window_views(np.asarray(series), seq_len, horizon)
+    return X.copy(), y.copy()
+
+class WindowBatches:
+    """
+    (X, y) batches gathered from window_views on demand; only one batch is
+    copied out at a time. `indices` restricts it to a subset of window
+    positions (e.g. a hold-out tail), `shuffle` reorders them every epoch.
+    Framework-neutral: train_service mixes in keras.utils.Sequence.
+    """
+
+    def __init__(self, values, seq_len=SEQ_LEN, horizon=7, batch_size=64, indices=None, shuffle=False, seed=None):
+        self.X, self.y = window_views(values, seq_len, horizon)
+        self.batch_size = batch_size
+        self.indices = np.arange(len(self.X)) if indices is None else np.asarray(indices)
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        if shuffle:
+            self._rng.shuffle(self.indices)
+
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+
+    def __getitem__(self, i):
+        idx = self.indices[i * self.batch_size:(i + 1) * self.batch_size]
+        return self.X[idx], self.y[idx]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self.indices)
 
 def scale_series(series, scaler=None, save_path=None):
     arr = series.values.reshape(-1,1)
@@ -0,0 +1,45 @@
+# backend/services/rollout_service.py
+import numpy as np
+
+
+def keras_predict_fn(model):
+    """
+    Direct-call inference for a Keras model: model(X, training=False) skips the
+    dataset/callback machinery model.predict() sets up on every call, which
+    dominates the cost for a single (1, SEQ_LEN, 1) window.
+    """
+    def predict(X):
+        return np.asarray(model(X, training=False))
+    return predict
+
+
+def rollout(predict_fn, seeds, steps):
+    """
+    Recursive multi-step forecast in scaled space.
+
+    seeds: (B, SEQ_LEN) scaled history windows (or a single (SEQ_LEN,) window).
+    predict_fn: maps (B, SEQ_LEN, 1) -> (B, horizon).
+    Every call consumes all `horizon` outputs, so one forward pass advances
+    `horizon` days. Returns a (B, steps) array of scaled forecasts.
+    """
+    window = np.asarray(seeds, dtype=np.float32)
+    if window.ndim == 1:
+        window = window[None, :]
+    seq_len = window.shape[1]
+
+    chunks, produced = [], 0
+    while produced < steps:
+        out = np.asarray(predict_fn(window[:, :, None]), dtype=np.float32).reshape(window.shape[0], -1)
+        chunks.append(out)
+        produced += out.shape[1]
+        window = np.concatenate([window, out], axis=1)[:, -seq_len:]
+
+    if not chunks:
+        return np.empty((window.shape[0], 0), dtype=np.float32)
+    return np.concatenate(chunks, axis=1)[:, :steps]
+
+
+def inverse_scale(scaler, scaled):
+    """One vectorised inverse_transform for a whole (B, steps) forecast block."""
+    scaled = np.asarray(scaled, dtype=float)
+    return scaler.inverse_transform(scaled.reshape(-1, 1)).reshape(scaled.shape)
@@ -0,0 +1,160 @@
+# backend/services/series_service.py
+import datetime
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from services.mongo_client import db
+from services.keys import commodity_key
+
+# Materialised daily price series.
+#
+# One `series` document per (state, district, crop) plus one state-pooled
+# document per (state, crop) with district=None. Each holds per-day price
+# sums and row counts from `start` onwards as packed arrays, so the
+# averaged/interpolated series predict and train use is one small read:
+#
+#   {"state", "district", "crop", "start": "YYYY-MM-DD", "end": "YYYY-MM-DD",
+#    "sums": <float64 bytes>, "counts": <int32 bytes>, "rev": <int>}
+#
+# `crop` is the normalised commodity_key of the crops docs. `rev` is bumped
+# by every refresh, so readers can key derived results (forecast cache) on it.
+
+
+def _decode(rec):
+    sums = np.frombuffer(rec["sums"], dtype=np.float64)
+    counts = np.frombuffer(rec["counts"], dtype=np.int32)
+    return sums, counts
+
+
+def to_series(rec):
+    """
+    Dense daily series from a record: per-day mean where there are rows,
+    linear interpolation across gaps (same as resample('D').mean().interpolate()).
+    """
+    sums, counts = _decode(rec)
+    have = np.flatnonzero(counts)
+    if have.size == 0:
+        return None
+    first, last = int(have[0]), int(have[-1])
+    prices = np.interp(np.arange(last - first + 1), have - first, sums[have] / counts[have])
+    start = datetime.date.fromisoformat(rec["start"]) + datetime.timedelta(days=first)
+    return pd.Series(prices, index=pd.date_range(start, periods=len(prices), freq="D"), name="price")
+
+
+def get_record(state, district, crop):
+    return db.series.find_one({"state": state, "district": district or None, "crop": commodity_key(crop)})
+
+
+def load_record(state, district, crop):
+    """
+    Series record for a district, falling back to the state-pooled record.
+    Returns (record, district_used) with district_used=None for the pooled
+    record, or (None, None) if nothing is materialised for (state, crop).
+    """
+    if district:
+        rec = get_record(state, district, crop)
+        if rec is not None:
+            return rec, district
+    return get_record(state, None, crop), None
+
+
+def load_series(state, district, crop):
+    """Dense series for a district (else state-pooled); returns (series, district_used)."""
+    rec, source = load_record(state, district, crop)
+    if rec is None:
+        return None, None
+    return to_series(rec), source
+
+
+def refresh_series(touched):
+    """
+    Re-derive the affected date window of each touched series from `crops`.
+
+    touched: {(state, crop): (min_date, max_date)} with ISO date strings.
+    Only rows inside the window are read, so the cost follows the size of the
+    new data. Positions in the window are overwritten (not added to), which
+    keeps this correct when it runs twice over the same rows.
+    """
+    windows = {}
+    for (state, crop), (lo, hi) in touched.items():
+        key = (state, commodity_key(crop))
+        if key in windows:
+            lo, hi = min(lo, windows[key][0]), max(hi, windows[key][1])
+        windows[key] = (lo, hi)
+
+    ops = []
+    for (state, ck), (lo, hi) in windows.items():
+        pipeline = [
+            {"$match": {"state": state,
+                        "commodity_key": ck,
+                        "date": {"$gte": lo, "$lte": hi}}},
+            {"$group": {"_id": {"district": "$district", "date": "$date"},
+                        "sum": {"$sum": "$price"}, "count": {"$sum": 1}}},
+        ]
+        per_district = {None: {}}
+        for r in db.crops.aggregate(pipeline):
+            dist, day = r["_id"]["district"], r["_id"]["date"]
+            per_district.setdefault(dist, {})[day] = (r["sum"], r["count"])
+            s, c = per_district[None].get(day, (0.0, 0))
+            per_district[None][day] = (s + r["sum"], c + r["count"])
+
+        for dist, days in per_district.items():
+            op = _patch_op(state, dist, ck, lo, hi, days)
+            if op is not None:
+                ops.append(op)
+        if len(ops) >= 500:
+            db.series.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db.series.bulk_write(ops, ordered=False)
+
+
+def _patch_op(state, district, ck, lo, hi, days):
+    rec = db.series.find_one({"state": state, "district": district, "crop": ck})
+    lo_d, hi_d = datetime.date.fromisoformat(lo), datetime.date.fromisoformat(hi)
+    if rec is None:
+        if not days:
+            return None
+        start, sums, counts = lo_d, np.zeros(0), np.zeros(0, dtype=np.int32)
+    else:
+        start = datetime.date.fromisoformat(rec["start"])
+        sums, counts = (a.copy() for a in _decode(rec))
+
+    # grow the arrays to cover [lo, hi]
+    if lo_d < start:
+        pad = (start - lo_d).days
+        sums = np.concatenate([np.zeros(pad), sums])
+        counts = np.concatenate([np.zeros(pad, dtype=np.int32), counts])
+        start = lo_d
+    need = (hi_d - start).days + 1
+    if need > len(sums):
+        sums = np.concatenate([sums, np.zeros(need - len(sums))])
+        counts = np.concatenate([counts, np.zeros(need - len(counts), dtype=np.int32)])
+
+    a, b = (lo_d - start).days, (hi_d - start).days + 1
+    sums[a:b], counts[a:b] = 0.0, 0
+    for day, (s, c) in days.items():
+        i = (datetime.date.fromisoformat(day) - start).days
+        sums[i], counts[i] = s, c
+
+    have = np.flatnonzero(counts)
+    end = start + datetime.timedelta(days=int(have[-1])) if have.size else start
+    return UpdateOne(
+        {"state": state, "district": district, "crop": ck},
+        {"$set": {"start": start.isoformat(), "end": end.isoformat(),
+                  "sums": sums.astype(np.float64).tobytes(),
+                  "counts": counts.astype(np.int32).tobytes()},
+         "$inc": {"rev": 1}},
+        upsert=True,
+    )
+
+
+def rebuild_all_series():
+    """Backfill every series from the `crops` collection (first run / after a migration)."""
+    bounds = db.crops.aggregate([
+        {"$group": {"_id": {"state": "$state", "crop": "$commodity_key"},
+                    "lo": {"$min": "$date"}, "hi": {"$max": "$date"}}},
+    ], allowDiskUse=True)
+    touched = {(b["_id"]["state"], b["_id"]["crop"]): (b["lo"], b["hi"]) for b in bounds}
+    refresh_series(touched)
+    return len(touched)
@@ -0,0 +1,61 @@
+# backend/services/singleflight.py
+import threading
+
+# Request coalescing within one worker process.
+#
+# SingleFlight.do(key, fn) runs fn() once per key at a time: a thread asking
+# for a key that is already being computed waits for that computation and
+# gets the same result (or exception) instead of starting its own. Nothing
+# is kept after the call finishes; caching stays with forecast_cache.
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result, self.error, self.waiters = None, None, 0
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0, "max_waiters": 0}
+
+    def do(self, key, fn):
+        """(fn() result, shared) where shared is True if another thread's call was joined."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if not leader:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
@@ -0,0 +1,281 @@
+# backend/services/train_scheduler.py
+import os, uuid, socket, threading, time, datetime
+import multiprocessing as mp
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from services.mongo_client import db
+from services.keys import commodity_key
+from config import TRAIN_WORKERS, TRAIN_TF_THREADS, TRAIN_JOBS_PER_WORKER, TRAIN_POLL_SECONDS, TRAIN_LEASE_SECONDS
+
+# Background training: /api/train records a job in `train_jobs` and returns its
+# id; job state/progress lives there so any web worker can answer status requests.
+#
+# One scheduler per deployment runs the jobs. Every web process (KM_ROLE=all)
+# runs a scheduler thread, but only the holder of the `scheduler_leases`
+# document "train" (renewed every KM_TRAIN_POLL_SECONDS, expiring after
+# KM_TRAIN_LEASE_SECONDS) claims queued jobs and owns the process pool, so at
+# most KM_TRAIN_WORKERS trainers run at once across all web processes. A new
+# holder fails the jobs the previous one left running: its pool died with it.
+#
+# Pool workers are spawned (not forked from a process that may already hold TF
+# state), limited to TRAIN_TF_THREADS TF threads each, and replaced after
+# TRAIN_JOBS_PER_WORKER jobs so TF graph memory does not pile up.
+_pool = None
+_pool_lock = threading.Lock()
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_sched = {"thread": None, "holder": False, "active": 0}
+_sched_lock = threading.Lock()
+_series = {}   # job_id -> pre-extracted training series (bulk batches), held by the lease holder
+
+
+def _init_worker(tf_threads):
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(tf_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = mp.get_context("spawn").Pool(
+                processes=TRAIN_WORKERS,
+                initializer=_init_worker,
+                initargs=(TRAIN_TF_THREADS,),
+                maxtasksperchild=TRAIN_JOBS_PER_WORKER,
+            )
+        return _pool
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+# ---- jobs (run inside pool workers) ----
+
+def _run_job(job_id, state, crop, series=None):
+    """Runs inside a worker process. `series` is the pre-extracted training series, if any."""
+    from tensorflow.keras import backend as K
+    from services.train_service import train_state_crop
+
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {"started_at": _now(), "pid": os.getpid()}})
+
+    def on_epoch(epoch, epochs, logs):
+        db.train_jobs.update_one({"_id": job_id}, {"$set": {
+            "progress": {"epoch": epoch, "epochs": epochs, "loss": float(logs.get("loss", 0.0))}}})
+
+    try:
+        meta = train_state_crop(state, crop, on_epoch=on_epoch, series=series)
+        update = {"status": "done", "meta": meta} if meta else {"status": "failed", "error": "insufficient data"}
+    except Exception as e:
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        K.clear_session()
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {**update, "finished_at": _now()}})
+    return None
+
+
+def _run_global_job(job_id):
+    """Trains the global multi-series model inside a worker process."""
+    from tensorflow.keras import backend as K
+    from services.global_model_service import train_global_model, load_training_series
+
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {"started_at": _now(), "pid": os.getpid()}})
+
+    def on_epoch(epoch, epochs, logs):
+        db.train_jobs.update_one({"_id": job_id}, {"$set": {
+            "progress": {"epoch": epoch, "epochs": epochs, "loss": float(logs.get("loss", 0.0))}}})
+
+    try:
+        meta = train_global_model(load_training_series(), on_epoch=on_epoch)
+        update = {"status": "done", "meta": meta} if meta else {"status": "failed", "error": "no usable series"}
+    except Exception as e:
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        K.clear_session()
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {**update, "finished_at": _now()}})
+    return None
+
+
+def _run_extract_job(job_id, batch_id, pairs, owner):
+    """
+    Runs inside a worker process: one extraction pass for a bulk batch.
+    Creates the batch's train jobs as "pending" and returns
+    [(job_id, series)] for the scheduler, which keeps the series and then
+    releases the jobs to the queue (a pool worker cannot submit to its own pool).
+    """
+    from services.extract_service import iter_training_series
+
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {"started_at": _now(), "pid": os.getpid()}})
+    try:
+        wanted = None if pairs is None else {(s, commodity_key(c)): c for s, c in pairs}
+        jobs = []
+        for state, commodity, series in iter_training_series(pairs):
+            crop = commodity if wanted is None else wanted.pop((state, commodity_key(commodity)), None)
+            if crop is not None:
+                jobs.append((_new_job(state, crop, batch_id, status="pending", owner=owner), series))
+        # requested pairs with no rows: the job reports insufficient data
+        for (state, _), crop in (wanted or {}).items():
+            jobs.append((_new_job(state, crop, batch_id, status="pending", owner=owner), None))
+    except Exception as e:
+        db.train_jobs.update_one({"_id": job_id}, {"$set": {"status": "failed", "error": str(e), "finished_at": _now()}})
+        return []
+    db.train_jobs.update_one({"_id": job_id}, {"$set": {"status": "done", "meta": {"jobs": len(jobs)},
+                                                        "finished_at": _now()}})
+    return jobs
+
+
+# ---- submission (any web process) ----
+
+def _new_job(state, crop, batch_id=None, status="queued", owner=None, **extra):
+    job_id = uuid.uuid4().hex
+    db.train_jobs.insert_one({"_id": job_id, "state": state, "crop": crop, "batch_id": batch_id,
+                              "status": status, "owner": owner, "progress": None, "created_at": _now(), **extra})
+    return job_id
+
+
+def submit(state, crop):
+    job_id = _new_job(state, crop)
+    start_scheduler()
+    return job_id
+
+
+def submit_global():
+    job_id = _new_job(None, None, kind="global")
+    start_scheduler()
+    return job_id
+
+
+def submit_many(pairs=None):
+    """
+    Enqueue a batch training every (state, crop) in `pairs`, or every pair in
+    `crops` when pairs is None; returns (batch_id, extract_job_id).
+
+    The request only records one "extract" job: the extract_service pass runs
+    inside the pool, creates one train job per pair, and the training series
+    travel with those jobs, so workers do not query Mongo for data.
+    """
+    batch_id = uuid.uuid4().hex
+    job_id = _new_job(None, None, batch_id, kind="extract",
+                      pairs=None if pairs is None else [list(p) for p in pairs])
+    start_scheduler()
+    return batch_id, job_id
+
+
+# ---- scheduler (lease holder only) ----
+
+def start_scheduler():
+    """Start this process's scheduler thread (idempotent)."""
+    with _sched_lock:
+        if _sched["thread"] is None:
+            _sched["thread"] = threading.Thread(target=_schedule_loop, daemon=True, name="train-scheduler")
+            _sched["thread"].start()
+
+
+def _schedule_loop():
+    while True:
+        try:
+            holder = _renew_lease()
+            if holder and not _sched["holder"]:
+                n = _fail_orphans()
+                print(f"🏋 Training scheduler lease taken by {_OWNER}" + (f"; {n} interrupted jobs failed" if n else ""))
+            _sched["holder"] = holder
+            if holder:
+                _claim_jobs()
+        except Exception as e:
+            print(f"⚠ training scheduler: {e}")
+        time.sleep(TRAIN_POLL_SECONDS)
+
+
+def _renew_lease():
+    now = _now()
+    try:
+        doc = db.scheduler_leases.find_one_and_update(
+            {"_id": "train", "$or": [{"owner": _OWNER}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": _OWNER, "expires_at": now + datetime.timedelta(seconds=TRAIN_LEASE_SECONDS)}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return False  # held by a live scheduler elsewhere
+    return doc is not None and doc["owner"] == _OWNER
+
+
+def _fail_orphans():
+    # jobs dispatched by an earlier holder: its pool is gone with it
+    res = db.train_jobs.update_many(
+        {"status": {"$in": ["running", "pending"]}, "owner": {"$ne": _OWNER}},
+        {"$set": {"status": "failed", "error": "interrupted: the scheduler running it stopped",
+                  "finished_at": _now()}})
+    return res.modified_count
+
+
+def _claim_jobs():
+    while True:
+        with _sched_lock:
+            if _sched["active"] >= TRAIN_WORKERS:
+                return
+        job = db.train_jobs.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "owner": _OWNER, "claimed_at": _now()}},
+            sort=[("created_at", 1)], return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            return
+        with _sched_lock:
+            _sched["active"] += 1
+        _dispatch(job)
+
+
+def _dispatch(job):
+    job_id, kind = job["_id"], job.get("kind")
+    fail = lambda e: _done(None, job_id, e)
+    try:
+        pool = _get_pool()
+    except Exception as e:
+        fail(e)
+        return
+    if kind == "global":
+        pool.apply_async(_run_global_job, (job_id,), callback=lambda r: _done(r, job_id), error_callback=fail)
+    elif kind == "extract":
+        pairs = None if job.get("pairs") is None else [tuple(p) for p in job["pairs"]]
+        pool.apply_async(_run_extract_job, (job_id, job["batch_id"], pairs, _OWNER),
+                         callback=lambda r: _done(r, job_id), error_callback=fail)
+    else:
+        series = _series.pop(job_id, None)
+        pool.apply_async(_run_job, (job_id, job["state"], job["crop"], series),
+                         callback=lambda r: _done(r, job_id), error_callback=fail)
+
+
+def _done(result, job_id, exc=None):
+    # pool result thread: free the slot, release an extract job's train jobs
+    with _sched_lock:
+        _sched["active"] -= 1
+    if exc is not None:
+        # the worker process died or the job could not be pickled
+        db.train_jobs.update_one({"_id": job_id}, {"$set": {"status": "failed", "error": str(exc),
+                                                            "finished_at": _now()}})
+    if result:
+        for jid, series in result:
+            if series is not None:
+                _series[jid] = series
+        db.train_jobs.update_many({"_id": {"$in": [jid for jid, _ in result]}, "status": "pending"},
+                                  {"$set": {"status": "queued"}})
+
+
+# ---- status ----
+
+def job_status(job_id):
+    job = db.train_jobs.find_one({"_id": job_id}, {"pairs": 0})
+    if job:
+        job["job_id"] = job.pop("_id")
+    return job
+
+
+def batch_status(batch_id):
+    counts = {r["_id"]: r["n"] for r in db.train_jobs.aggregate([
+        {"$match": {"batch_id": batch_id}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+    ])}
+    return {"batch_id": batch_id, "total": sum(counts.values()), **counts}
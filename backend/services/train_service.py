@@ -1,19 +1,26 @@
 # backend/services/train_service.py
-import os, json, joblib, yaml
+import os, json, joblib, yaml, shutil, tempfile
 from pathlib import Path
 import numpy as np
-import pandas as pd
 
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, LambdaCallback
+from tensorflow.keras.utils import Sequence
 from sklearn.metrics import mean_squared_error
 from services.mongo_client import db
-from services.preprocess_service import load_series_from_docs, create_sequences, scale_series
+from services.model_registry import invalidate as invalidate_model
+from services import forecast_cache, numpy_lstm
+from services.series_service import load_series
+from services.extract_service import iter_training_series
+from services.preprocess_service import scale_series, WindowBatches
 from config import MODELS_DIR, SEQ_LEN, PRED_HORIZON, EPOCHS, BATCH_SIZE
 
 Path(MODELS_DIR).mkdir(parents=True, exist_ok=True)
 
+class WindowSequence(WindowBatches, Sequence):
+    """WindowBatches that model.fit / model.predict accept directly."""
+
 def build_model(seq_len=SEQ_LEN, horizon=PRED_HORIZON):
     model = Sequential()
     model.add(LSTM(128, input_shape=(seq_len,1), return_sequences=False))
@@ -22,36 +29,56 @@ def build_model(seq_len=SEQ_LEN, horizon=PRED_HORIZON):
     model.compile(optimizer='adam', loss='mse')
     return model
 
-def train_state_crop(state, crop):
-    # fetch all docs for this state & crop (pool districts)
-    cursor = db.crops.find({"state":state, "commodity": {"$regex": f"^{crop}$", "$options":"i"}}, {"date":1,"price":1})
-    docs = list(cursor)
-    if not docs:
-        print("No docs for", state, crop)
-        return None
-    # group by date (some markets repeat dates) -> average price per date
-    df = {}
-    for d in docs:
-        key = d['date']
-        df.setdefault(key, []).append(d['price'])
-    series_docs = [{"date":k, "price": float(sum(v)/len(v))} for k,v in df.items()]
-    series = load_series_from_docs(series_docs)
+def train_state_crop(state, crop, on_epoch=None, series=None):
+    """
+    Train and save the (state, crop) model. on_epoch(epoch, epochs, logs), if
+    given, is called after every epoch (used by the training scheduler for progress).
+    `series` is the daily price series when the caller already has it
+    (bulk training via extract_service); otherwise it is read from Mongo.
+    """
+    if series is None:
+        # state-pooled daily series, materialised at ingest time
+        series, _ = load_series(state, None, crop)
+    if series is None:
+        # not materialised yet: daily $avg over all districts, grouped server-side
+        found = next(iter_training_series([(state, crop)]), None)
+        if found is None:
+            print("No docs for", state, crop)
+            return None
+        series = found[2]
     if len(series) < SEQ_LEN + PRED_HORIZON + 10:
         print("Insufficient series length for", state, crop, len(series))
         return None
-    scaled, scaler = scale_series(series, None, save_path=os.path.join(MODELS_DIR, f"{state}__{crop}__scaler.pkl"))
-    X, y = create_sequences(pd.Series(scaled), seq_len=SEQ_LEN, horizon=PRED_HORIZON)
-    if X.shape[0] < 50:
+    scaled, scaler = scale_series(series, None)
+    # windows are strided views over `scaled`; batches are copied out on demand
+    train = WindowSequence(scaled, SEQ_LEN, PRED_HORIZON, BATCH_SIZE, shuffle=True)
+    n = len(train.X)
+    if n < 50:
         print("Not enough sequences for", state, crop)
         return None
+    # Scaler, checkpoints and .npz are written to a scratch dir next to the
+    # live files and moved into place only after training, so serving never
+    # sees a new scaler with the old model, a half-trained checkpoint or a torn .h5.
+    scratch = tempfile.mkdtemp(dir=MODELS_DIR, prefix=f".train__{state}__{crop}.")
+    try:
+        return _fit_and_publish(state, crop, scaled, scaler, train, n, on_epoch, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _fit_and_publish(state, crop, scaled, scaler, train, n, on_epoch, scratch):
+    names = [f"{state}__{crop}__model.h5", f"{state}__{crop}__model.npz", f"{state}__{crop}__scaler.pkl"]
+    mtmp, ntmp, stmp = (os.path.join(scratch, name) for name in names)
+    joblib.dump(scaler, stmp)
     model = build_model()
-    mpath = os.path.join(MODELS_DIR, f"{state}__{crop}__model.h5")
-    cb = [EarlyStopping(patience=6, restore_best_weights=True), ModelCheckpoint(mpath, save_best_only=True, monitor='loss')]
-    model.fit(X, y, epochs=EPOCHS, batch_size=BATCH_SIZE, callbacks=cb, verbose=1)
+    cb = [EarlyStopping(patience=6, restore_best_weights=True), ModelCheckpoint(mtmp, save_best_only=True, monitor='loss')]
+    if on_epoch:
+        cb.append(LambdaCallback(on_epoch_end=lambda epoch, logs: on_epoch(epoch + 1, EPOCHS, logs or {})))
+    model.fit(train, epochs=EPOCHS, callbacks=cb, verbose=1)
     # evaluate
-    split = int(0.9 * len(X))
-    ypred = model.predict(X[split:])
-    ytrue = y[split:]
+    split = int(0.9 * n)
+    ypred = model.predict(WindowSequence(scaled, SEQ_LEN, PRED_HORIZON, BATCH_SIZE, indices=np.arange(split, n)))
+    ytrue = train.y[split:]
     try:
         ypred_inv = scaler.inverse_transform(ypred.reshape(-1,1)).reshape(ypred.shape)
         ytrue_inv = scaler.inverse_transform(ytrue.reshape(-1,1)).reshape(ytrue.shape)
@@ -60,6 +87,14 @@ def train_state_crop(state, crop):
     rmse = float(np.sqrt(mean_squared_error(ytrue_inv.flatten(), ypred_inv.flatten())))
     mape = float(np.mean(np.abs((ytrue_inv.flatten() - ypred_inv.flatten())/(ytrue_inv.flatten()+1e-9))) * 100)
     meta = {"state":state,"crop":crop,"rmse":rmse,"mape":mape}
+    numpy_lstm.export_h5(mtmp, ntmp)  # weights for the TF-free serving path
+    # model first, its .npz after it (so it is not older than the .h5), scaler last; a
+    # reader racing the three renames caches a version that no longer matches and reloads
+    for tmp, name in zip((mtmp, ntmp, stmp), names):
+        os.replace(tmp, os.path.join(MODELS_DIR, name))
     db.models_meta.update_one({"state":state,"crop":crop},{"$set":meta}, upsert=True)
+    # serving processes also notice the new file mtime; this just frees the stale copy here
+    invalidate_model(state, crop)
+    forecast_cache.invalidate_model(state, crop)
     print("Saved model for", state, crop, "RMSE:", rmse, "MAPE:", mape)
     return meta
@@ -0,0 +1,102 @@
+# backend/services/warmup_service.py
+import json, os, threading, time
+import numpy as np
+from config import (TOPCROPS_JSON, PRELOAD_MODELS, MODEL_CACHE_SIZE, SEQ_LEN, PRED_HORIZON,
+                    FORECAST_MODE, INFERENCE_ENGINE, ROLE)
+
+# Preload + warm-up for serving processes.
+#
+# Popular (state, crop) pairs are ranked from top_crops_by_district.json (a
+# crop high in many districts' lists ranks high), so nothing here talks to
+# Mongo and it is safe to run in the gunicorn master before forking: the
+# loaded NumPy weights and the imported predict stack are then shared
+# copy-on-write by every worker. The warm-up runs one synthetic forecast per
+# loaded model through the same predictor/rollout/inverse-scale path as
+# predict_state_crop. /api/ready reports not-ready while a warm-up is running;
+# a process that never starts one (flask run, tests) is simply ready, cold.
+_state = {"warming": False, "started_at": None, "seconds": None, "warmed": 0, "skipped": 0, "errors": 0}
+_lock = threading.Lock()
+
+
+def popular_pairs(limit=PRELOAD_MODELS, require_model=True):
+    """Up to `limit` (state, crop) pairs (with a trained per-pair model if require_model), most popular first."""
+    from services.model_registry import model_version
+    try:
+        with open(TOPCROPS_JSON, encoding="utf-8") as f:
+            top = json.load(f)
+    except (OSError, ValueError):
+        return []
+    scores = {}
+    for key, crops in top.items():
+        state = key.split("__", 1)[0]
+        for rank, crop in enumerate(crops):
+            scores[(state, crop)] = scores.get((state, crop), 0) + len(crops) - rank
+    ranked = sorted(scores, key=lambda k: -scores[k])
+    if require_model:
+        ranked = [p for p in ranked if model_version(*p) is not None]
+    return ranked[:limit]
+
+
+def _warm_one(state, crop):
+    from services.model_registry import get_predictor
+    from services.rollout_service import rollout, inverse_scale
+    predict_fn, scaler = get_predictor(state, crop)
+    if predict_fn is None:
+        return False
+    scaled = rollout(predict_fn, np.zeros(SEQ_LEN, dtype=np.float32), PRED_HORIZON)
+    inverse_scale(scaler, scaled)
+    return True
+
+
+def run(pairs=None):
+    """Preload and warm `pairs` (default: popular_pairs()); the process reports warming until done."""
+    t0 = time.perf_counter()
+    with _lock:
+        _state.update(warming=True, started_at=time.time(), warmed=0, skipped=0, errors=0)
+    try:
+        _warm(pairs)
+    finally:
+        with _lock:
+            _state.update(warming=False, seconds=round(time.perf_counter() - t0, 3))
+    print(f"🔥 Warm-up done: {_state['warmed']} models in {_state['seconds']} s")
+
+
+def _warm(pairs):
+    import services.predict_service  # noqa: F401  (pandas, registry, caches: imported once, shared after fork)
+    if pairs is None:
+        if FORECAST_MODE == "global":
+            # one model serves every pair; a few pairs exercise loading + the embedding lookups
+            pairs = popular_pairs(limit=8, require_model=False)
+        else:
+            pairs = popular_pairs(limit=min(PRELOAD_MODELS, MODEL_CACHE_SIZE))
+    for state, crop in pairs:
+        try:
+            outcome = "warmed" if _warm_one(state, crop) else "skipped"
+        except Exception as e:
+            print(f"⚠ warm-up failed for {state}/{crop}: {e}")
+            outcome = "errors"
+        with _lock:
+            _state[outcome] += 1
+
+
+def start(blocking=False, pre_fork=False):
+    """
+    Run the warm-up now (blocking) or in a background thread. pre_fork: called in
+    a process that will fork workers; the Keras engine is skipped there since
+    TensorFlow state does not survive fork (workers load it after forking).
+    """
+    if ROLE in ("meta", "market"):
+        return  # no prediction routes in this process: nothing to warm
+    if pre_fork and INFERENCE_ENGINE == "keras":
+        return
+    if blocking:
+        run()
+    else:
+        with _lock:
+            _state["warming"] = True  # before the thread runs, so /api/ready cannot report ready in between
+        threading.Thread(target=run, daemon=True, name="warmup").start()
+
+
+def readiness():
+    with _lock:
+        return dict(_state, pid=os.getpid())
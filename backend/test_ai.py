@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -16,7 +17,14 @@ def run_train():
     print(f"\n🤖 Training model for {STATE} - {CROP}...")
     payload = {"state": STATE, "crop": CROP}
     r = requests.post(f"{BASE_URL}/train", json=payload)
-    print("Response:", r.json())
+    job = r.json()
+    print("Response:", job)
+    # training runs in the background; wait for the job to finish
+    while job.get("status") in ("queued", "running"):
+        time.sleep(5)
+        job = requests.get(f"{BASE_URL}/train/jobs/{job['job_id']}").json()
+        print("  status:", job.get("status"), job.get("progress") or "")
+    print("Result:", job.get("meta") or job.get("error"))
 
 def run_predict():
     print(f"\n📊 Getting predictions for {STATE} - {DISTRICT} - {CROP}...")
@@ -1,29 +1,29 @@
 # backend/train_all.py
-from services.mongo_client import db
+import time
 import requests
 
-# URL of your backend training endpoint
-TRAIN_URL = "http://127.0.0.1:5000/api/train"
-
-def get_all_state_crop_pairs():
-    # Get all unique (state, crop) pairs from DB
-    pipeline = [
-        {"$group": {"_id": {"state": "$state", "commodity": "$commodity"}}}
-    ]
-    results = db.crops.aggregate(pipeline)
-    return [(r["_id"]["state"], r["_id"]["commodity"]) for r in results]
+# URL of your backend training endpoints
+BASE_URL = "http://127.0.0.1:5000/api/train"
 
 def main():
-    pairs = get_all_state_crop_pairs()
-    print(f"Found {len(pairs)} state–crop pairs to train.")
+    # One bulk submission; the backend's training workers take it from there
+    resp = requests.post(f"{BASE_URL}/bulk", json={"all": True})
+    data = resp.json()
+    if resp.status_code != 202:
+        print("❌ Bulk submission failed:", data)
+        return
+    batch_id = data["batch_id"]
+    print(f"🚀 Queued training batch {batch_id}; extracting training data first.")
 
-    for state, crop in pairs:
-        print(f"🚀 Training for {state} – {crop}...")
-        resp = requests.post(TRAIN_URL, json={"state": state, "crop": crop})
-        try:
-            print("✅", resp.json())
-        except Exception:
-            print("❌ Training failed:", resp.text)
+    while True:
+        status = requests.get(f"{BASE_URL}/batches/{batch_id}").json()
+        finished = status.get("done", 0) + status.get("failed", 0)
+        print(f"⏳ {finished}/{status['total']} finished "
+              f"(running {status.get('running', 0)}, failed {status.get('failed', 0)})")
+        if finished >= status["total"]:
+            break
+        time.sleep(10)
+    print("✅ Training batch complete.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,17 @@
+# backend/wsgi.py
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (gunicorn.conf.py) this module is imported once in the
+master: the most popular models are loaded and warmed here, before the
+workers are forked, so they share those pages copy-on-write and serve the
+first request at steady-state latency. Outside gunicorn the warm-up runs in
+a background thread and /api/ready turns 200 when it finishes.
+"""
+import os
+from app import app
+from services import warmup_service
+
+warmup_service.start(blocking=os.environ.get("KM_WARMUP_BLOCKING") == "1", pre_fork=True)